@@ -3,54 +3,366 @@
 # -----------------------------------------------------------------
 import streamlit as st
 import openai
-import fitz
-import re
+import httpx
 import yaml
 import streamlit_authenticator as stauth
 import datetime
+import csv
+import hashlib
+import hmac
+import io
+import json
+import random
+import time
+import uuid
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from pdf_extraction import extract_pdf_text
+from prompt_compaction import compact_prompt_inputs, compact_text, count_tokens
+from output_parser import parse_ai_output, parse_structured_output, StreamingOutputParser, STRUCTURED_RESPONSE_FORMAT
+from job_queue import JobQueue
+from metrics import GenerationTrace, MetricsStore, PDF_EXTRACTION, GENERATION, RANKING, summarize, summarize_spans, summarize_routes, bucket_over_time
+from generation_cache import GenerationCache, make_cache_key, DEFAULT_TTL_SECONDS, DEFAULT_MAX_ENTRIES
+from quota_store import QuotaStore, fingerprint
+from history_store import HistoryStore
+from model_router import CircuitOpenError, ModelRouter
+from candidate_index import CandidateIndex, HashingEmbedder, OpenAIEmbedder, SentenceTransformerEmbedder, rank_candidates
 from yaml.loader import SafeLoader
-from streamlit_cookies_manager import EncryptedCookieManager # CORRECT IMPORT
 
 # -----------------------------------------------------------------
 # 2. HELPER FUNCTIONS
 # -----------------------------------------------------------------
 
+@st.cache_data
+def read_static_file(file_name, mode="r"):
+    """Reads a static asset from disk once per process."""
+    with open(file_name, mode) as f:
+        return f.read()
+
 def local_css(file_name):
     """Loads a local CSS file."""
-    with open(file_name) as f:
-        st.markdown(f'<style>{f.read()}</style>', unsafe_allow_html=True)
+    st.markdown(f'<style>{read_static_file(file_name)}</style>', unsafe_allow_html=True)
+
+# Parsed PDFs are kept per process, keyed by a hash of their bytes, so reruns and re-uploads skip PyMuPDF entirely
+PDF_CACHE_MAX_ENTRIES = 64
+
+# Only the first pages/characters of a document are read; anything past that rarely helps the prompt
+PDF_MAX_PAGES = int(st.secrets.get("PDF_MAX_PAGES", 20))
+PDF_MAX_CHARS = int(st.secrets.get("PDF_MAX_CHARS", 30000))
+
+@st.cache_data(max_entries=PDF_CACHE_MAX_ENTRIES, show_spinner=False)
+def _extract_text_from_pdf_bytes(file_hash, max_pages, max_chars, _pdf_bytes):
+    """Parses PDF bytes within the page/character budget. Cached on file_hash; the bytes themselves are not re-hashed."""
+    # Only real parses reach this point, so each one is recorded; cache hits cost next to nothing
+    trace = GenerationTrace(kind=PDF_EXTRACTION, file_bytes=len(_pdf_bytes))
+    with trace.span("extract_text_from_pdf"):
+        text = extract_pdf_text(_pdf_bytes, max_pages=max_pages, max_chars=max_chars)
+    trace.fields["chars"] = len(text)
+    metrics_store.record(trace)
+    return text
 
 def extract_text_from_pdf(pdf_file):
     """Extracts text from an uploaded PDF file."""
     try:
-        pdf_document = fitz.open(stream=pdf_file.read(), filetype="pdf")
-        return "".join(page.get_text() for page in pdf_document)
+        pdf_bytes = pdf_file.getvalue()
+        return _extract_text_from_pdf_bytes(hashlib.sha256(pdf_bytes).hexdigest(), PDF_MAX_PAGES, PDF_MAX_CHARS, pdf_bytes)
     except Exception as e:
         st.error(f"Error reading PDF file: {e}", icon="🚨")
         return None
 
-def parse_ai_output(output_text):
-    """Parses the structured output from the AI model."""
-    name_match = re.search(r"\[CANDIDATE_NAME\](.*?)\[END_CANDIDATE_NAME\]", output_text, re.DOTALL)
-    key_points_match = re.search(r"\[KEY_POINTS\](.*?)\[END_KEY_POINTS\]", output_text, re.DOTALL)
-    messages_match = re.search(r"\[OUTREACH_MESSAGES\](.*?)\[EMAIL_MESSAGE\]", output_text, re.DOTALL)
-    email_match = re.search(r"\[EMAIL_MESSAGE\](.*)", output_text, re.DOTALL)
-
-    name = name_match.group(1).strip() if name_match else "Candidate"
-    key_points = key_points_match.group(1).strip() if key_points_match else ""
-    messages_raw = messages_match.group(1).strip() if messages_match else ""
-    # Remove [END_OUTREACH_MESSAGES] if present
-    messages_raw = messages_raw.replace('[END_OUTREACH_MESSAGES]', '').strip()
-    messages = [msg.strip().lstrip('1.2.3. ') for msg in re.split(r'\n\d\.\s*', messages_raw) if msg.strip()]
-    email = email_match.group(1).strip() if email_match else ""
-    # Remove [END_EMAIL_MESSAGE] if present
-    email = email.replace('[END_EMAIL_MESSAGE]', '').strip()
-    
-    # Prepend the extracted name to the key_points for display
-    # We will format it properly in the display logic
-    full_key_points = f"**Name:** {name}\n\n{key_points}"
-    
-    return {"name": name, "key_points": key_points, "short_messages": messages, "long_message": email}
+def build_user_prompt(candidate_profile, job_description, recruiter_name, company_name, role_title):
+    """Builds the user prompt that accompanies the system prompt."""
+    return f"""[CANDIDATE_PROFILE]{candidate_profile}[END_CANDIDATE_PROFILE][JOB_DESCRIPTION]{job_description}[END_JOB_DESCRIPTION][RECRUITER_NAME]{recruiter_name}[COMPANY_NAME]{company_name}[ROLE_TITLE]{role_title}"""
+
+def complete(system_prompt, user_prompt, parser=None, on_update=None, trace=None, stage="generation", response_format=None):
+    """Runs one chat completion and returns its text.
+
+    When a StreamingOutputParser is given the completion is streamed into it,
+    and on_update is called with the partially parsed output as sections fill in.
+    A response_format (structured output) is only used for non-streamed calls.
+    The model comes from the stage's route (see MODEL_ROUTES). The call's duration
+    and token usage are added to trace under the stage name, along with the route taken.
+    """
+    messages = [{"role": "system", "content": system_prompt}, {"role": "user", "content": user_prompt}]
+    with trace.span(f"chat.completions.create:{stage}") if trace else nullcontext():
+        if parser is None:
+            extra = {"response_format": response_format} if response_format else {}
+            response = model_router.complete(stage, messages, trace, **extra)
+            if trace:
+                trace.add_usage(response.usage)
+            return response.choices[0].message.content
+        return _stream_completion(stage, messages, parser, on_update, trace)
+
+def _stream_completion(stage, messages, parser, on_update, trace):
+    """Streams a completion into parser and returns the full text."""
+    text, last_snapshot, last_update = "", None, 0.0
+    for chunk in model_router.stream(stage, messages, trace):
+        # The final chunk carries the token usage and no choices
+        if trace and getattr(chunk, "usage", None):
+            trace.add_usage(chunk.usage)
+        if not chunk.choices or not chunk.choices[0].delta.content:
+            continue
+        text += chunk.choices[0].delta.content
+        snapshot = parser.feed(chunk.choices[0].delta.content)
+        # Redrawing on every token floods the frontend; only redraw changed content, a few times a second
+        if on_update and snapshot != last_snapshot and time.monotonic() - last_update >= STREAM_RENDER_INTERVAL_SECONDS:
+            on_update(snapshot)
+            last_snapshot, last_update = snapshot, time.monotonic()
+    return text
+
+def analyze_job_description(job_description, trace=None):
+    """Stage 1: condenses the job description into a brief, computed once per distinct JD."""
+    cache_key = make_cache_key("job_analysis", model_router.models("job_analysis"), JOB_ANALYSIS_PROMPT_VERSION, job_description)
+    analysis = generation_cache.get_or_set(cache_key, lambda: {"text": complete(JOB_ANALYSIS_PROMPT, job_description, trace=trace, stage="job_analysis")},
+                                          namespace="job_analysis")
+    return analysis["text"]
+
+def summarize_profile(candidate_profile, parser=None, on_update=None, trace=None):
+    """Stage 2: extracts the candidate's name and key points, computed once per distinct profile."""
+    cache_key = make_cache_key("profile_summary", model_router.models("profile_summary"), PROFILE_SUMMARY_PROMPT_VERSION, candidate_profile)
+    summary = generation_cache.get_or_set(cache_key, lambda: {"text": complete(PROFILE_SUMMARY_PROMPT, candidate_profile, parser, on_update, trace, "profile_summary")},
+                                         namespace="profile_summary")
+    # A cached summary never went through the parser, so show it in one go
+    if parser is not None and not parser.text:
+        parser.feed(summary["text"])
+        if on_update:
+            on_update(parser.snapshot())
+    return summary["text"]
+
+def write_messages(profile_summary, job_analysis, recruiter_name, company_name, role_title, parser=None, on_update=None, trace=None):
+    """Stage 3: writes the short messages and email from the two cached summaries."""
+    user_prompt = f"""[CANDIDATE_SUMMARY]{profile_summary}[END_CANDIDATE_SUMMARY][JOB_ANALYSIS]{job_analysis}[END_JOB_ANALYSIS][RECRUITER_NAME]{recruiter_name}[COMPANY_NAME]{company_name}[ROLE_TITLE]{role_title}"""
+    return complete(MESSAGE_WRITING_PROMPT, user_prompt, parser, on_update, trace, "write_messages")
+
+def run_staged_pipeline(candidate_profile, job_description, recruiter_name, company_name, role_title, parser=None, on_update=None, trace=None):
+    """Runs the three stages and returns their combined output in the single-call format."""
+    # The JD analysis runs alongside the profile summary; only the final stage needs both
+    with ThreadPoolExecutor(max_workers=1) as stage_executor:
+        job_analysis_future = stage_executor.submit(analyze_job_description, job_description, trace)
+        profile_summary = summarize_profile(candidate_profile, parser, on_update, trace)
+        job_analysis = job_analysis_future.result()
+    if parser is not None:
+        parser.feed("\n")
+    messages = write_messages(profile_summary, job_analysis, recruiter_name, company_name, role_title, parser, on_update, trace)
+    return f"{profile_summary}\n{messages}"
+
+def generate_outreach(candidate_profile, job_description, recruiter_name, company_name, role_title, on_update=None, use_cached_output=True, trace=None):
+    """Generates and parses the outreach content for one candidate.
+
+    When on_update is given the completion is streamed, and on_update is called
+    with the partially parsed output as sections fill in. use_cached_output=False
+    writes fresh messages while still reusing the cached JD and profile stages.
+    Timings, token usage and the cache outcome are recorded to the metrics store.
+    """
+    trace = trace or GenerationTrace()
+    trace.fields.update(pipeline=GENERATION_PIPELINE, output_format=OUTPUT_FORMAT)
+    try:
+        # Identical inputs against the same model and prompt version are served from the cache
+        cache_key = make_cache_key(MODEL_ROUTES, PROMPT_VERSION, candidate_profile, job_description, recruiter_name, company_name, role_title)
+        cached_output = generation_cache.get(cache_key) if use_cached_output else None
+        if cached_output is not None:
+            trace.cache_hit = True
+            if on_update:
+                on_update(cached_output)
+            return cached_output
+
+        user_prompt = build_user_prompt(candidate_profile, job_description, recruiter_name, company_name, role_title)
+        if OUTPUT_FORMAT == "json":
+            # A JSON reply cannot be shown section by section, so it is neither streamed nor staged
+            raw_output = complete(STRUCTURED_SYSTEM_PROMPT, user_prompt, trace=trace, response_format=STRUCTURED_RESPONSE_FORMAT)
+            with trace.span("parse_structured_output"):
+                output = parse_structured_output(raw_output)
+            if on_update:
+                on_update(output)
+            generation_cache.set(cache_key, output)
+            return output
+
+        parser = StreamingOutputParser() if on_update else None
+        if GENERATION_PIPELINE == "single":
+            raw_output = complete(SYSTEM_PROMPT, user_prompt, parser, on_update, trace)
+        else:
+            raw_output = run_staged_pipeline(candidate_profile, job_description, recruiter_name, company_name, role_title, parser, on_update, trace)
+        with trace.span("parse_ai_output"):
+            output = parse_ai_output(raw_output)
+        if on_update:
+            on_update(output)
+        generation_cache.set(cache_key, output)
+        return output
+    except Exception as e:
+        trace.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        trace.finish()
+        metrics_store.record(trace)
+
+def _retry_after_seconds(error):
+    """Reads the Retry-After header from an API error, if the server sent one."""
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+def generate_outreach_with_backoff(*args, max_retries=None, token_report=None):
+    """Runs generate_outreach, backing off exponentially on rate limits and transient API errors."""
+    max_retries = BATCH_MAX_RETRIES if max_retries is None else max_retries
+    delay = 1.0
+    for attempt in range(max_retries + 1):
+        try:
+            # Each attempt is its own request as far as the metrics are concerned
+            return generate_outreach(*args, trace=GenerationTrace(mode="batch", attempt=attempt, **(token_report or {})))
+        except (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError) as e:
+            if attempt == max_retries:
+                raise
+            # Honour the server's hint when there is one, otherwise use jittered exponential backoff
+            time.sleep(_retry_after_seconds(e) or delay + random.uniform(0, delay))
+            delay = min(delay * 2, BATCH_MAX_BACKOFF_SECONDS)
+
+def load_uploaded_text(uploaded_file):
+    """Returns the text of an uploaded PDF or plain-text file, raising if it cannot be read; used where errors are collected per file."""
+    if uploaded_file.type == "application/pdf":
+        pdf_bytes = uploaded_file.getvalue()
+        return _extract_text_from_pdf_bytes(hashlib.sha256(pdf_bytes).hexdigest(), PDF_MAX_PAGES, PDF_MAX_CHARS, pdf_bytes)
+    elif uploaded_file.type == "text/plain":
+        return uploaded_file.getvalue().decode("utf-8")
+    return None
+
+def read_uploaded_text(uploaded_file):
+    """Returns the text of an uploaded PDF or plain-text file."""
+    if uploaded_file.type == "application/pdf":
+        return extract_text_from_pdf(uploaded_file)
+    elif uploaded_file.type == "text/plain":
+        try:
+            return uploaded_file.getvalue().decode("utf-8")
+        except UnicodeDecodeError as e:
+            st.error(f"Error reading text file: {e}", icon="🚨")
+            return None
+    return None
+
+def show_token_report(report):
+    """Shows how many input tokens prompt compaction saved."""
+    saved = report["tokens_before"] - report["tokens_after"]
+    st.caption(f"Prompt input: {report['tokens_before']:,} → {report['tokens_after']:,} tokens ({saved:,} saved by compaction)")
+
+def show_extraction_status(text):
+    """Confirms under an uploader how much text was extracted from the file."""
+    if text:
+        st.caption(f"✅ Extracted {len(text):,} characters.")
+    elif text is not None:
+        st.caption("⚠️ No text could be extracted from this file.")
+
+def sign_visitor_id(visitor):
+    """Returns the visitor cookie's value: the ID and an HMAC of it under the cookie key."""
+    signature = hmac.new(st.secrets['cookie']['key'].encode("utf-8"), visitor.encode("utf-8"), hashlib.sha256).hexdigest()[:32]
+    return f"{visitor}.{signature}"
+
+def read_visitor_cookie():
+    """Returns the visitor ID from this browser's signed cookie, or None if it has none or the signature is wrong."""
+    cookie_manager = authenticator.cookie_handler.cookie_manager
+    for token in (st.context.cookies.get(VISITOR_COOKIE_NAME), cookie_manager.get(VISITOR_COOKIE_NAME)):
+        if isinstance(token, str) and "." in token and hmac.compare_digest(token, sign_visitor_id(token.split(".", 1)[0])):
+            return token.split(".", 1)[0]
+    return None
+
+def visitor_id():
+    """Identifies an anonymous visitor by a signed, long-lived browser cookie (see store_visitor_cookie)."""
+    if 'visitor_id' not in st.session_state:
+        st.session_state.visitor_id = read_visitor_cookie() or uuid.uuid4().hex
+    return st.session_state.visitor_id
+
+def store_visitor_cookie():
+    """Saves the visitor ID in the browser; call once per run.
+
+    The cookie component is rendered until the browser reports the cookie back,
+    so a rerun before it lands does not lose it.
+    """
+    cookie_manager = authenticator.cookie_handler.cookie_manager
+    if cookie_manager.get(VISITOR_COOKIE_NAME) is None:
+        cookie_manager.set(VISITOR_COOKIE_NAME, sign_visitor_id(visitor_id()), key="visitor_cookie",
+                           expires_at=datetime.datetime.now() + datetime.timedelta(days=VISITOR_COOKIE_DAYS))
+
+def client_ip():
+    """The client's address from X-Forwarded-For, counting back FORWARDED_FOR_TRUSTED_HOPS proxies; None if untrusted or absent.
+
+    st.context.ip_address is the nearest proxy's address behind a load balancer, so it is never used.
+    """
+    if FORWARDED_FOR_TRUSTED_HOPS <= 0:
+        return None
+    forwarded_for = st.context.headers.get("X-Forwarded-For")
+    if not isinstance(forwarded_for, str):
+        return None
+    addresses = [address.strip() for address in forwarded_for.split(",") if address.strip()]
+    return addresses[-FORWARDED_FOR_TRUSTED_HOPS] if len(addresses) >= FORWARDED_FOR_TRUSTED_HOPS else None
+
+def current_quota():
+    """Returns (subject, limit, window_seconds) for this session: the logged-in user's plan, or the anonymous visitor's free tier."""
+    if st.session_state.get('authentication_status'):
+        username = st.session_state['username']
+        limit, window_seconds = plan_limits.get(username, (None, None))
+        return f"user:{username}", limit, window_seconds
+    return f"visitor:{visitor_id()}", FREE_GENERATION_LIMIT, QUOTA_WINDOW_DAYS * 24 * 3600
+
+def session_quotas():
+    """Every quota a generation in this session counts against: current_quota(), plus a per-IP cap for anonymous visitors."""
+    quotas = [current_quota()]
+    ip_address = None if st.session_state.get('authentication_status') else client_ip()
+    if ip_address:
+        quotas.append((f"ip:{fingerprint(ip_address)}", FREE_GENERATION_IP_LIMIT, QUOTA_WINDOW_DAYS * 24 * 3600))
+    return quotas
+
+def remaining_generations():
+    """Generations left before one of this session's quotas runs out; None if unlimited."""
+    remaining = [max(0, limit - quota_store.usage(subject, window)) for subject, limit, window in session_quotas() if limit is not None]
+    return min(remaining) if remaining else None
+
+def consume_quota():
+    """Takes one generation from every quota; returns the (subject, event ID) pairs to release on failure, or None if one is used up."""
+    events = []
+    for subject, limit, window in session_quotas():
+        event_id = quota_store.try_consume(subject, limit, window)
+        if event_id is None:
+            release_quota(events)
+            return None
+        events.append((subject, event_id))
+    return events
+
+def release_quota(events):
+    """Gives back the generations consume_quota() took."""
+    for subject, event_id in events or ():
+        quota_store.release(subject, event_id)
+
+def history_owner():
+    """Returns the key this session's generation history is kept under; anonymous visitors have none."""
+    if st.session_state.get('authentication_status'):
+        return f"user:{st.session_state['username']}"
+    return None
+
+def record_history(output, history_meta):
+    """Adds a finished generation to the user's history and makes the sidebar list reload."""
+    owner = history_owner()
+    if owner is None:
+        return
+    history_store.add(owner, output, **history_meta)
+    st.session_state.history_listing = None
+
+def batch_results_to_csv(results):
+    """Serializes batch results to CSV, one row per candidate file."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=["file_name", "name", "key_points", "short_message_1", "short_message_2", "short_message_3", "long_message", "error"])
+    writer.writeheader()
+    for result in results:
+        row = {"file_name": result["file_name"], "name": result.get("name", ""), "key_points": result.get("key_points", ""),
+               "long_message": result.get("long_message", ""), "error": result.get("error", "")}
+        for i, msg in enumerate(result.get("short_messages", [])[:3]):
+            row[f"short_message_{i+1}"] = msg
+        writer.writerow(row)
+    return buffer.getvalue()
+
+def batch_results_to_jsonl(results):
+    """Serializes batch results to JSON Lines, one object per candidate file."""
+    return "".join(json.dumps(result, ensure_ascii=False) + "\n" for result in results)
 
 # -----------------------------------------------------------------
 # 3. CONFIGURATION AND INITIALIZATION
@@ -89,19 +401,50 @@ st.markdown("""
 local_css("style.css")
 
 # --- User Authentication ---
-# Manually build a new, mutable dictionary from Streamlit's secrets
-# This is the definitive fix to avoid the "Secrets does not support item assignment" error.
-credentials = {'usernames': {}}
-for username, user_info in st.secrets['credentials']['usernames'].items():
-    credentials['usernames'][username] = {
-        'email': user_info['email'],
-        'name': user_info['name'],
-        'password': user_info['password']
-    }
-
-# Initialize the cookie manager directly with the secret key
-cookies = EncryptedCookieManager(password=st.secrets['cookie']['key'])
+@st.cache_data
+def load_credentials():
+    """Builds the credentials dict once per process; each call hands back a fresh copy."""
+    # Manually build a new, mutable dictionary from Streamlit's secrets
+    # This is the definitive fix to avoid the "Secrets does not support item assignment" error.
+    credentials = {'usernames': {}}
+    for username, user_info in st.secrets['credentials']['usernames'].items():
+        credentials['usernames'][username] = {
+            'email': user_info['email'],
+            'name': user_info['name'],
+            'password': user_info['password']
+        }
+    return credentials
+
+# st.cache_data returns a copy, so the authenticator can still mutate its credentials safely
+credentials = load_credentials()
+
+# Generation quotas: anonymous visitors get FREE_GENERATION_LIMIT per window; logged-in users
+# get their plan's limit (credentials.usernames.<user>.plan -> credentials.plans.<plan>), else no limit
+FREE_GENERATION_LIMIT = int(st.secrets.get("FREE_GENERATION_LIMIT", 3))
+QUOTA_WINDOW_DAYS = float(st.secrets.get("QUOTA_WINDOW_DAYS", 30))
+
+# Anonymous visitors are told apart by a signed cookie. Behind a proxy that appends to
+# X-Forwarded-For, set FORWARDED_FOR_TRUSTED_HOPS to the number of such proxies to also cap
+# all visitors from one address at FREE_GENERATION_IP_LIMIT (e.g. against cleared cookies)
+VISITOR_COOKIE_NAME = f"{st.secrets['cookie']['name']}_visitor"
+VISITOR_COOKIE_DAYS = 365
+FORWARDED_FOR_TRUSTED_HOPS = int(st.secrets.get("FORWARDED_FOR_TRUSTED_HOPS", 0))
+FREE_GENERATION_IP_LIMIT = int(st.secrets.get("FREE_GENERATION_IP_LIMIT", 20))
+
+@st.cache_data
+def load_plan_limits():
+    """Maps each username to its plan's (generation limit, window in seconds); a None limit means unlimited."""
+    plans = st.secrets['credentials'].get('plans', {})
+    limits = {}
+    for username, user_info in st.secrets['credentials']['usernames'].items():
+        plan = plans.get(user_info.get('plan'), {})
+        limits[username] = (plan.get('generation_limit'), float(plan.get('window_days', QUOTA_WINDOW_DAYS)) * 24 * 3600)
+    return limits
 
+plan_limits = load_plan_limits()
+
+# The authenticator wraps a per-browser component, so unlike the resources below
+# it must be created for every session and rerun
 # Initialize the authenticator with values directly from secrets
 authenticator = stauth.Authenticate(
     credentials,
@@ -111,18 +454,80 @@ authenticator = stauth.Authenticate(
 )
 
 # --- OpenAI Client & Prompt ---
+MODEL_NAME = "gpt-4.1-mini"
+
+# Models per generation stage ("job_analysis", "profile_summary", "write_messages", "generation"), preferred first.
+# Later models are used when the earlier ones fail or their circuit is open, e.g. in secrets:
+#   [MODEL_ROUTES]
+#   profile_summary = ["gpt-4.1-nano", "gpt-4.1-mini"]
+FALLBACK_MODEL_NAME = st.secrets.get("FALLBACK_MODEL_NAME", "gpt-4o-mini")
+MODEL_ROUTES = {"default": [model for model in (MODEL_NAME, FALLBACK_MODEL_NAME) if model]}
+MODEL_ROUTES.update({stage: list(models) for stage, models in st.secrets.get("MODEL_ROUTES", {}).items()})
+
+# Batch mode fans candidates out over a bounded worker pool; keep it small enough to stay under the account's rate limits
+BATCH_MAX_WORKERS = int(st.secrets.get("BATCH_MAX_WORKERS", 8))
+# The router has already tried every model in the route by the time an error gets here, so this is a last wait, not a retry loop
+BATCH_MAX_RETRIES = 1
+BATCH_MAX_BACKOFF_SECONDS = 30
+
+STREAM_RENDER_INTERVAL_SECONDS = 0.15
+
+# Generations run on process-wide background queues; sessions poll for their job's progress
+GENERATION_MAX_WORKERS = int(st.secrets.get("GENERATION_MAX_WORKERS", 16))
+JOB_POLL_INTERVAL_SECONDS = 0.5
+BATCH_POLL_INTERVAL_SECONDS = 1.0
+
+# Token budgets the profile and job description are compacted to before they are embedded in the prompt
+PROFILE_TOKEN_BUDGET = int(st.secrets.get("PROFILE_TOKEN_BUDGET", 3000))
+JOB_DESCRIPTION_TOKEN_BUDGET = int(st.secrets.get("JOB_DESCRIPTION_TOKEN_BUDGET", 1500))
+
+# One client per process: every session and worker shares its keep-alive connection pool.
+# Its retries only apply to embeddings; chat completions go through the router, which retries by falling back
+OPENAI_TIMEOUT_SECONDS = float(st.secrets.get("OPENAI_TIMEOUT_SECONDS", 60))
+OPENAI_CONNECT_TIMEOUT_SECONDS = float(st.secrets.get("OPENAI_CONNECT_TIMEOUT_SECONDS", 5))
+OPENAI_MAX_RETRIES = int(st.secrets.get("OPENAI_MAX_RETRIES", 2))
+OPENAI_MAX_CONNECTIONS = int(st.secrets.get("OPENAI_MAX_CONNECTIONS", 64))
+OPENAI_MAX_KEEPALIVE_CONNECTIONS = int(st.secrets.get("OPENAI_MAX_KEEPALIVE_CONNECTIONS", 32))
+# Overridden to point the app at the local stand-in in bench/mock_openai.py
+OPENAI_BASE_URL = st.secrets.get("OPENAI_BASE_URL")
+
+@st.cache_resource
+def get_openai_client():
+    """Creates the OpenAI client and its pooled HTTP connections once per process."""
+    http_client = openai.DefaultHttpxClient(
+        limits=httpx.Limits(max_connections=OPENAI_MAX_CONNECTIONS, max_keepalive_connections=OPENAI_MAX_KEEPALIVE_CONNECTIONS, keepalive_expiry=60),
+    )
+    return openai.OpenAI(
+        api_key=st.secrets["OPENAI_API_KEY"],
+        base_url=OPENAI_BASE_URL,
+        timeout=httpx.Timeout(OPENAI_TIMEOUT_SECONDS, connect=OPENAI_CONNECT_TIMEOUT_SECONDS),
+        max_retries=OPENAI_MAX_RETRIES,
+        http_client=http_client,
+    )
+
 try:
-    client = openai.OpenAI(api_key=st.secrets["OPENAI_API_KEY"])
+    client = get_openai_client()
 except Exception as e:
     st.error("OpenAI client error. Is your API key set in Streamlit Secrets?", icon="🚨")
     st.stop()
 
-SYSTEM_PROMPT = """
+@st.cache_resource
+def get_model_router():
+    """Creates the model router once per process, so latency history and circuit state are shared."""
+    # Room for every queue worker's calls plus their hedges, so attempts never wait behind each other
+    return ModelRouter(client, MODEL_ROUTES, max_workers=4 * (GENERATION_MAX_WORKERS + BATCH_MAX_WORKERS))
+
+model_router = get_model_router()
+
+PROMPT_INTRO = """
 You are an expert recruitment assistant and persuasive copywriter named "TalentReach AI." 
 Your tone is professional yet enthusiastic, approachable, and genuine. The goal is to start a real conversation.
 Your multi-step task is as follows:
 
-// STEP 0: EXTRACT CANDIDATE NAME
+"""
+
+# Steps 0-1 depend only on the candidate profile
+PROFILE_STEPS_PROMPT = """// STEP 0: EXTRACT CANDIDATE NAME
 First, find the candidate's name from the profile text. Output it enclosed in tags like this: [CANDIDATE_NAME]John Doe[END_CANDIDATE_NAME].
 
 // STEP 1: PARSE AND STRUCTURE THE CANDIDATE'S PROFILE
@@ -143,7 +548,10 @@ Next, analyze the Candidate Profile. Extract the following information and struc
 - (A bullet point listing key technical or soft skills found in the resume).
 [END_KEY_POINTS]
 
-// STEP 2: WRITE PERSUASIVE SHORT MESSAGES
+"""
+
+# Steps 2-3 combine the profile with the job, recruiter, company and role
+MESSAGE_STEPS_PROMPT = """// STEP 2: WRITE PERSUASIVE SHORT MESSAGES
 Generate three distinct outreach messages (each under 100 words) that feel genuine, warm, and conversational. The goal is to spark a reply.
 Requirements for all three messages:
 1. Begin with a natural greeting using the candidate’s name (e.g., “Hi [Candidate’s Name], ...”).
@@ -183,6 +591,126 @@ Output format:
 (Your email content here)
 """
 
+SYSTEM_PROMPT = PROMPT_INTRO + PROFILE_STEPS_PROMPT + MESSAGE_STEPS_PROMPT
+
+# Structured output: the same steps, returned as one JSON object (see output_parser.OUTPUT_SCHEMA)
+STRUCTURED_SYSTEM_PROMPT = SYSTEM_PROMPT + """
+// OUTPUT
+Return a single JSON object instead of the tagged format above, with no surrounding text:
+- "candidate_name": the name from STEP 0.
+- "key_points": the STEP 1 summary, from **Educational Summary:** to the end of **Skills:**, keeping its Markdown.
+- "short_messages": the three STEP 2 messages in order, without their numbers.
+- "email_message": the STEP 3 email, starting with the **Subject:** line.
+Do not include any [TAG] markers in the values.
+"""
+
+# --- Staged pipeline prompts ---
+# The JD is analysed once per distinct job description and the profile once per distinct candidate,
+# so only the final message-writing stage runs again when the recruiter, company or role title changes.
+JOB_ANALYSIS_PROMPT = """
+You are an expert recruitment analyst. Read the Job Description and write a compact brief that a copywriter will use to pitch the role to candidates.
+Only use information stated in the job description. Structure it exactly like this:
+[JOB_ANALYSIS]
+**Role Summary:**
+(1-2 sentences on what the role does and its seniority).
+
+**Key Requirements:**
+- (Up to 5 bullet points covering the essential skills, experience and education).
+
+**Selling Points:**
+- (Up to 4 bullet points on what makes the role attractive: impact, projects, growth, team, mission, culture, benefits).
+[END_JOB_ANALYSIS]
+"""
+
+PROFILE_SUMMARY_PROMPT = PROMPT_INTRO + PROFILE_STEPS_PROMPT
+
+MESSAGE_WRITING_PROMPT = PROMPT_INTRO + """The candidate's name and key points have already been extracted from their profile, and the job description has already been condensed into a job analysis.
+Use the candidate summary as the candidate's background and the job analysis as the job description.
+
+""" + MESSAGE_STEPS_PROMPT
+
+# "staged" splits generation into the three stages above; "single" sends SYSTEM_PROMPT in one call
+GENERATION_PIPELINE = st.secrets.get("GENERATION_PIPELINE", "staged")
+# "tagged" parses the [SECTION] markers; "json" asks for schema-validated structured output in a single call
+OUTPUT_FORMAT = st.secrets.get("OUTPUT_FORMAT", "tagged")
+
+def prompt_version(*prompts):
+    """Hashes prompt text so any wording change retires the cached generations made with the old wording."""
+    return hashlib.sha256("".join(prompts).encode("utf-8")).hexdigest()[:12]
+
+PROMPT_VERSION = prompt_version(GENERATION_PIPELINE, OUTPUT_FORMAT, STRUCTURED_SYSTEM_PROMPT, SYSTEM_PROMPT, JOB_ANALYSIS_PROMPT, PROFILE_SUMMARY_PROMPT, MESSAGE_WRITING_PROMPT)
+JOB_ANALYSIS_PROMPT_VERSION = prompt_version(JOB_ANALYSIS_PROMPT)
+PROFILE_SUMMARY_PROMPT_VERSION = prompt_version(PROFILE_SUMMARY_PROMPT)
+
+@st.cache_resource
+def get_generation_cache():
+    """Opens the generation cache once per process so every session shares it."""
+    return GenerationCache(
+        st.secrets.get("GENERATION_CACHE_PATH", "generation_cache.db"),
+        ttl_seconds=int(st.secrets.get("GENERATION_CACHE_TTL_SECONDS", DEFAULT_TTL_SECONDS)),
+        max_entries=int(st.secrets.get("GENERATION_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+    )
+
+generation_cache = get_generation_cache()
+
+@st.cache_resource
+def get_quota_store():
+    """Opens the generation quota store once per process so every session counts against it."""
+    return QuotaStore(st.secrets.get("QUOTA_DB_PATH", "quota.db"))
+
+quota_store = get_quota_store()
+
+@st.cache_resource
+def get_metrics_store():
+    """Opens the metrics sink once per process."""
+    return MetricsStore(st.secrets.get("METRICS_DB_PATH", "metrics.db"))
+
+metrics_store = get_metrics_store()
+
+# Past generations are listed HISTORY_PAGE_SIZE at a time, newest first, in a scroll area of HISTORY_LIST_HEIGHT pixels
+HISTORY_PAGE_SIZE = int(st.secrets.get("HISTORY_PAGE_SIZE", 20))
+HISTORY_LIST_HEIGHT = 420
+
+@st.cache_resource
+def get_history_store():
+    """Opens the generation history once per process so every session shares its connection."""
+    return HistoryStore(st.secrets.get("HISTORY_DB_PATH", "history.db"))
+
+history_store = get_history_store()
+
+# Usernames allowed to see the metrics dashboard
+ADMIN_USERNAMES = list(st.secrets.get("ADMIN_USERNAMES", []))
+
+@st.cache_resource
+def get_job_queue():
+    """Starts the interactive generation queue once per process."""
+    return JobQueue(GENERATION_MAX_WORKERS, name="generation")
+
+@st.cache_resource
+def get_batch_job_queue():
+    """Starts a separate queue for batch candidates so large batches cannot starve single generations."""
+    return JobQueue(BATCH_MAX_WORKERS, name="batch")
+
+job_queue = get_job_queue()
+batch_job_queue = get_batch_job_queue()
+
+# Candidate ranking: "hashing" needs nothing extra; "openai" and "sentence-transformers" use EMBEDDING_MODEL
+EMBEDDING_PROVIDER = st.secrets.get("EMBEDDING_PROVIDER", "hashing")
+EMBEDDING_MODEL = st.secrets.get("EMBEDDING_MODEL")
+
+@st.cache_resource
+def get_candidate_index():
+    """Loads the on-disk candidate vector index and its embedder once per process."""
+    if EMBEDDING_PROVIDER == "openai":
+        embedder = OpenAIEmbedder(client, EMBEDDING_MODEL or "text-embedding-3-small")
+    elif EMBEDDING_PROVIDER == "sentence-transformers":
+        embedder = SentenceTransformerEmbedder(EMBEDDING_MODEL or "all-MiniLM-L6-v2")
+    else:
+        embedder = HashingEmbedder()
+    return CandidateIndex(st.secrets.get("CANDIDATE_INDEX_DIR", "candidate_index"), embedder)
+
+candidate_index = get_candidate_index()
+
 # -----------------------------------------------------------------
 # 4. UI COMPONENTS (MODULAR FUNCTIONS)
 # -----------------------------------------------------------------
@@ -230,6 +758,9 @@ def run_main_app():
     if 'output' not in st.session_state:
         st.session_state.output = None
 
+    if 'loading' not in st.session_state:
+        st.session_state.loading = False
+
     left_col, right_col = st.columns([1.2, 1])
     
     # --- LEFT COLUMN (INPUTS) ---
@@ -239,10 +770,14 @@ def run_main_app():
         profile_tab1, profile_tab2 = st.tabs(["Upload PDF", "Paste Text"])
         with profile_tab1:
             uploaded_candidate_file = st.file_uploader("Upload Candidate Profile or Resume", type=["pdf", "txt"], key="candidate_uploader")
+            # Extract as soon as the file arrives; later reruns and the generate click hit the cache
+            uploaded_candidate_text = read_uploaded_text(uploaded_candidate_file) if uploaded_candidate_file else None
+            if uploaded_candidate_file:
+                show_extraction_status(uploaded_candidate_text)
             with st.expander("ℹ️ How to get a LinkedIn Profile PDF"):
                 st.write("1. Navigate to the LinkedIn profile you want to save.")
                 st.write("2. Click the **'More'** button.")
-                st.image("assets/moreImage.png")
+                st.image(read_static_file("assets/moreImage.png", "rb"))
                 st.write("3. Select **'Save to PDF'** from the dropdown menu.")
         with profile_tab2:
             candidate_profile_text_input = st.text_area("Paste the candidate's full resume or profile text here", height=250, key="candidate_text", label_visibility="collapsed")
@@ -250,6 +785,9 @@ def run_main_app():
         jd_tab1, jd_tab2 = st.tabs(["Upload PDF", "Paste Text"])
         with jd_tab1:
             uploaded_job_file = st.file_uploader("Upload Job Description", type=["pdf", "txt"], key="job_uploader")
+            uploaded_job_text = read_uploaded_text(uploaded_job_file) if uploaded_job_file else None
+            if uploaded_job_file:
+                show_extraction_status(uploaded_job_text)
         with jd_tab2:
             job_description_text_input = st.text_area("Paste the full job description here", height=250, key="job_text", label_visibility="collapsed")
         
@@ -258,35 +796,28 @@ def run_main_app():
         role_title = st.text_input("Role Title", placeholder="e.g., Senior AI Engineer")
 
 
-        generate_button = st.button("✨ Generate Messages", use_container_width=True, type="primary")
+        generate_button = st.button("✨ Generate Messages", use_container_width=True, type="primary", disabled=st.session_state.loading)
+        # Fresh messages for the same inputs; the JD analysis and profile summary are reused
+        regenerate_button = st.button("🔄 Regenerate Messages", use_container_width=True, disabled=st.session_state.loading or not st.session_state.output)
 
     # ---------- LOGIC & OUTPUT (RIGHT COLUMN) ----------
     with right_col:
         st.markdown("<h4 style='text-align: center;'>✍️ Generated Content</h4>", unsafe_allow_html=True)
 
-        if 'output' not in st.session_state:
-            st.session_state.output = None
-
-        if 'loading' not in st.session_state:
-            st.session_state.loading = False
+        if 'job_id' not in st.session_state:
+            st.session_state.job_id = None
 
-        if generate_button:
+        if generate_button or regenerate_button:
             st.session_state.output = None
             candidate_profile, job_description = "", ""
             # Candidate profile extraction
             if uploaded_candidate_file:
-                if uploaded_candidate_file.type == "application/pdf":
-                    candidate_profile = extract_text_from_pdf(uploaded_candidate_file)
-                elif uploaded_candidate_file.type == "text/plain":
-                    candidate_profile = uploaded_candidate_file.read().decode("utf-8")
+                candidate_profile = uploaded_candidate_text
             elif candidate_profile_text_input:
                 candidate_profile = candidate_profile_text_input
             # Job description extraction
             if uploaded_job_file:
-                if uploaded_job_file.type == "application/pdf":
-                    job_description = extract_text_from_pdf(uploaded_job_file)
-                elif uploaded_job_file.type == "text/plain":
-                    job_description = uploaded_job_file.read().decode("utf-8")
+                job_description = uploaded_job_text
             elif job_description_text_input:
                 job_description = job_description_text_input
 
@@ -300,57 +831,381 @@ def run_main_app():
             if not role_title:
                 missing_fields.append("role title")
 
+            # The quota is taken before the job starts so concurrent clicks cannot overrun it; failures give it back
+            quota_events = None if missing_fields else consume_quota()
             if missing_fields:
                 st.warning(f"Please provide: {', '.join(missing_fields)}.", icon="⚠️")
                 st.session_state.output = None # Clear previous output on new attempt with missing info
                 st.session_state.loading = False
+            elif quota_events is None:
+                # Running out is expected, not a failure, so it is a warning rather than an error
+                st.warning("You have used all of your generations for now.", icon="⚠️")
+                st.session_state.loading = False
             else:
-                with st.spinner("Working its magic..."):
-                    try:
-                        user_prompt = f"""[CANDIDATE_PROFILE]{candidate_profile}[END_CANDIDATE_PROFILE][JOB_DESCRIPTION]{job_description}[END_JOB_DESCRIPTION][RECRUITER_NAME]{recruiter_name}[COMPANY_NAME]{company_name}[ROLE_TITLE]{role_title}"""
-                        response = client.chat.completions.create(model="gpt-4.1-mini", messages=[{"role": "system", "content": SYSTEM_PROMPT}, {"role": "user", "content": user_prompt}])
-                        raw_output = response.choices[0].message.content
-                        st.session_state.output = parse_ai_output(raw_output)
-
-                        # CRITICAL: If this was a free user, set the cookie and rerun
-                        if not st.session_state.authentication_status:
-                            # Get the current count again before incrementing
-                            current_count = int(cookies.get('generation_count', 0))
-                            new_count = current_count + 1
-                            # Save the new count back to the cookie
-                            cookies['generation_count'] = str(new_count)
-                            st.rerun()
+                st.session_state.quota_events = quota_events
+                st.session_state.history_meta = {"role_title": role_title, "company_name": company_name}
+                trace = GenerationTrace(mode="single")
+                with trace.span("prompt_build"):
+                    candidate_profile, job_description, st.session_state.token_report = compact_prompt_inputs(candidate_profile, job_description, PROFILE_TOKEN_BUDGET, JOB_DESCRIPTION_TOKEN_BUDGET)
+                trace.fields.update(st.session_state.token_report)
+                use_cached_output = not regenerate_button
+                # An exact repeat is answered here, without the job queue's polling round trip
+                cache_key = make_cache_key(MODEL_ROUTES, PROMPT_VERSION, candidate_profile, job_description, recruiter_name, company_name, role_title)
+                cached_output = generation_cache.get(cache_key) if use_cached_output else None
+                if cached_output is not None:
+                    trace.fields.update(pipeline=GENERATION_PIPELINE, output_format=OUTPUT_FORMAT)
+                    trace.cache_hit = True
+                    trace.finish()
+                    metrics_store.record(trace)
+                    st.session_state.output = cached_output
+                    record_history(cached_output, st.session_state.history_meta)
+                    st.session_state.quota_events = None
+                else:
+                    # The generation runs on the shared job queue, so reruns while it works neither cancel nor repeat it.
+                    # The cache was just checked, so the job goes straight to generating.
+                    job_key = make_cache_key(MODEL_ROUTES, PROMPT_VERSION, candidate_profile, job_description, recruiter_name, company_name, role_title, use_cached_output)
+                    st.session_state.job_id = job_queue.submit(job_key, generate_outreach, candidate_profile, job_description, recruiter_name, company_name, role_title,
+                                                               use_cached_output=False, trace=trace, with_progress=True)
+                    st.session_state.loading = True
 
-                    except Exception as e:
-                        st.error(f"An error occurred: {e}", icon="🚨")
-                        st.session_state.output = None
-                    st.session_state.loading = False
+        if st.session_state.get('generation_error'):
+            st.error(f"An error occurred: {st.session_state.generation_error}", icon="🚨")
+            st.session_state.generation_error = None
+        if st.session_state.get('generation_unavailable'):
+            st.warning(st.session_state.generation_unavailable, icon="⏳")
+            st.session_state.generation_unavailable = None
 
         # Display logic that's always running
-        info_tab, messages_tab, email_tab = st.tabs(["Candidate Info", "Short Messages", "Long Message"])
-        
-        if st.session_state.output:
-            with info_tab:
-                st.markdown(f"<h3 style='text-align: center; font-weight: bold;'>{st.session_state.output['name']}</h3>", unsafe_allow_html=True)
-                formatted_points = st.session_state.output["key_points"].replace(":**", ":**\n")
-                st.markdown(formatted_points)
-            with messages_tab:
-                # Your message display logic...
-                for i, msg in enumerate(st.session_state.output["short_messages"]):
-                    st.markdown(f"<div style='text-align: center; font-weight: bold;'>Option {i+1}</div>", unsafe_allow_html=True)
-                    st.markdown("\n")
-                    st.markdown(msg)
-                    st.divider()
-            with email_tab:
-                # Your email display logic...
-                st.markdown(st.session_state.output["long_message"])
+        if st.session_state.job_id:
+            show_generation_job()
         else:
-            with info_tab:
-                st.info("The candidate's summarized profile will appear here.")
-            with messages_tab:
-                st.info("Short message options will appear here.")
-            with email_tab:
-                st.info("A detailed email draft will appear here.")
+            show_output(st.session_state.output)
+            if st.session_state.output and st.session_state.get('token_report'):
+                show_token_report(st.session_state.token_report)
+
+@st.fragment(run_every=JOB_POLL_INTERVAL_SECONDS)
+def show_generation_job():
+    """Polls this session's background generation, drawing partial output until it finishes."""
+    job = job_queue.get(st.session_state.job_id)
+    if job is not None and not job.finished:
+        st.caption("⏳ Working its magic...")
+        show_output(job.partial)
+        return
+
+    st.session_state.job_id = None
+    st.session_state.loading = False
+    if job is not None and isinstance(job.error, CircuitOpenError):
+        # Nothing went wrong with this request; the model is resting after too many failures
+        st.session_state.generation_unavailable = str(job.error)
+        release_quota(st.session_state.get('quota_events'))
+    elif job is None or job.error:
+        st.session_state.generation_error = str(job.error) if job else "The generation expired before it could be collected. Please try again."
+        release_quota(st.session_state.get('quota_events'))
+    else:
+        st.session_state.output = job.result
+        record_history(job.result, st.session_state.get('history_meta', {}))
+    st.session_state.quota_events = None
+    st.rerun()
+
+def show_candidate_info(output):
+    """Displays the candidate's name and summarized key points."""
+    st.markdown(f"<h3 style='text-align: center; font-weight: bold;'>{output['name']}</h3>", unsafe_allow_html=True)
+    formatted_points = output["key_points"].replace(":**", ":**\n")
+    st.markdown(formatted_points)
+
+def show_short_messages(output):
+    """Displays each short outreach message as a numbered option."""
+    for i, msg in enumerate(output["short_messages"]):
+        st.markdown(f"<div style='text-align: center; font-weight: bold;'>Option {i+1}</div>", unsafe_allow_html=True)
+        st.markdown("\n")
+        st.markdown(msg)
+        st.divider()
+
+def show_long_message(output):
+    """Displays the long-form email."""
+    st.markdown(output["long_message"])
+
+def show_output(output):
+    """Displays generated content in the Candidate Info / Short Messages / Long Message tabs."""
+    info_tab, messages_tab, email_tab = st.tabs(["Candidate Info", "Short Messages", "Long Message"])
+
+    if output:
+        with info_tab:
+            show_candidate_info(output)
+        with messages_tab:
+            show_short_messages(output)
+        with email_tab:
+            show_long_message(output)
+    else:
+        with info_tab:
+            st.info("The candidate's summarized profile will appear here.")
+        with messages_tab:
+            st.info("Short message options will appear here.")
+        with email_tab:
+            st.info("A detailed email draft will appear here.")
+
+def history_label(row):
+    """One line per past generation: candidate, role and company, and when it was written."""
+    written = datetime.datetime.fromtimestamp(row["created_at"]).strftime("%b %d, %H:%M")
+    return f"{row['name']} · {row['role_title'] or '—'} at {row['company_name'] or '—'} · {written}"
+
+def fetch_history_page(owner, query, before_id=None):
+    """Returns (rows, more) for one page; a single extra row is read to know whether another page follows."""
+    rows = history_store.page(owner, query, before_id=before_id, limit=HISTORY_PAGE_SIZE + 1)
+    return rows[:HISTORY_PAGE_SIZE], len(rows) > HISTORY_PAGE_SIZE
+
+def load_more_history(owner):
+    """Appends the next page of the current listing, continuing from its oldest entry."""
+    listing = st.session_state.history_listing
+    rows, listing["more"] = fetch_history_page(owner, listing["query"], before_id=listing["rows"][-1]["id"])
+    listing["rows"].extend(rows)
+
+def show_history_entry(owner, history_id):
+    """Puts a past generation back on screen without calling the model."""
+    output = history_store.get(owner, history_id)
+    if output is None:
+        return
+    st.session_state.output = output
+    st.session_state.token_report = None
+    st.session_state.mode = "Single Candidate"
+
+def show_history():
+    """Lists the user's past generations in the sidebar, searchable and loaded a page at a time."""
+    owner = history_owner()
+    query = st.text_input("Search history", key="history_query", placeholder="Name, skill or phrase")
+    # The listing is kept across reruns and only re-queried when the search changes or a generation finishes
+    listing = st.session_state.get('history_listing')
+    if listing is None or listing["query"] != query:
+        rows, more = fetch_history_page(owner, query)
+        listing = st.session_state.history_listing = {"query": query, "rows": rows, "more": more}
+
+    if not listing["rows"]:
+        st.caption("No matching generations." if query else "Your generations will be listed here.")
+        return
+    # Full outputs are read only when an entry is clicked; the scroll area keeps a long list from stretching the sidebar
+    with st.container(height=HISTORY_LIST_HEIGHT):
+        for row in listing["rows"]:
+            st.button(history_label(row), key=f"history_{row['id']}", on_click=show_history_entry, args=(owner, row["id"]), use_container_width=True)
+        if listing["more"]:
+            st.button("Load more", key="history_more", on_click=load_more_history, args=(owner,), use_container_width=True)
+
+def show_batch_result(result):
+    """Displays one candidate's batch result in a collapsible panel."""
+    if "error" in result:
+        st.error(f"{result['file_name']}: {result['error']}", icon="🚨")
+        return
+    with st.expander(f"{result['name']} — {result['file_name']}"):
+        show_output(result)
+
+def run_batch_app():
+    """Generates outreach for many candidate files against one job description."""
+    show_header()
+
+    if 'batch_results' not in st.session_state:
+        st.session_state.batch_results = None
+
+    if 'batch_jobs' not in st.session_state:
+        st.session_state.batch_jobs = None
+
+    if 'batch_ranking' not in st.session_state:
+        st.session_state.batch_ranking = None
+
+    left_col, right_col = st.columns([1.2, 1])
+
+    # --- LEFT COLUMN (INPUTS) ---
+    with left_col:
+        st.markdown("<h4 style='text-align: center;'>📄 Batch Input Details</h4>", unsafe_allow_html=True)
+        candidate_files = st.file_uploader("Upload Candidate Profiles or Resumes", type=["pdf", "txt"], accept_multiple_files=True, key="batch_candidate_uploader")
+
+        jd_tab1, jd_tab2 = st.tabs(["Upload PDF", "Paste Text"])
+        with jd_tab1:
+            uploaded_job_file = st.file_uploader("Upload Job Description", type=["pdf", "txt"], key="batch_job_uploader")
+        with jd_tab2:
+            job_description_text_input = st.text_area("Paste the full job description here", height=250, key="batch_job_text", label_visibility="collapsed")
+
+        recruiter_name = st.text_input("Your Name (Recruiter)", placeholder="Your Name", key="batch_recruiter_name")
+        company_name = st.text_input("Company Name", placeholder="Your Company", key="batch_company_name")
+        role_title = st.text_input("Role Title", placeholder="e.g., Senior AI Engineer", key="batch_role_title")
+
+        # Ranking runs before any generation, so only the best matches cost LLM tokens
+        top_k = st.number_input("Only generate for the top matches (0 = all candidates)", min_value=0, value=0, step=5, key="batch_top_k")
+        selected_count = min(top_k, len(candidate_files)) if top_k else len(candidate_files)
+
+        generate_button = st.button(f"✨ Generate Messages for {selected_count} Candidates", use_container_width=True, type="primary", disabled=not candidate_files or bool(st.session_state.batch_jobs))
+
+    # ---------- LOGIC & OUTPUT (RIGHT COLUMN) ----------
+    with right_col:
+        st.markdown("<h4 style='text-align: center;'>✍️ Generated Content</h4>", unsafe_allow_html=True)
+
+        if generate_button:
+            st.session_state.batch_results = None
+            st.session_state.batch_jobs = None
+            st.session_state.batch_ranking = None
+            job_description = ""
+            if uploaded_job_file:
+                job_description = read_uploaded_text(uploaded_job_file)
+            elif job_description_text_input:
+                job_description = job_description_text_input
+
+            missing_fields = []
+            if not job_description:
+                missing_fields.append("job description")
+            if not recruiter_name:
+                missing_fields.append("recruiter name")
+            if not company_name:
+                missing_fields.append("company name")
+            if not role_title:
+                missing_fields.append("role title")
+
+            if missing_fields:
+                st.warning(f"Please provide: {', '.join(missing_fields)}.", icon="⚠️")
+            else:
+                # The job description is shared by every candidate, so it is compacted once
+                job_description_tokens_before = count_tokens(job_description)
+                job_description = compact_text(job_description, JOB_DESCRIPTION_TOKEN_BUDGET)
+                job_description_tokens_after = count_tokens(job_description)
+                batch_jobs, candidates = [], []
+                for candidate_file in candidate_files:
+                    # A file that cannot be read fails on its own line in the results rather than stopping the batch
+                    try:
+                        candidate_profile = load_uploaded_text(candidate_file)
+                    except UnicodeDecodeError:
+                        batch_jobs.append({"result": {"file_name": candidate_file.name, "error": "This file is not UTF-8 text."}})
+                        continue
+                    except Exception as e:
+                        batch_jobs.append({"result": {"file_name": candidate_file.name, "error": f"Could not read this file: {e}"}})
+                        continue
+                    if not candidate_profile:
+                        batch_jobs.append({"result": {"file_name": candidate_file.name, "error": "Could not read any text from this file."}})
+                        continue
+                    candidates.append((candidate_file.name, candidate_profile, compact_text(candidate_profile, PROFILE_TOKEN_BUDGET)))
+
+                if top_k and len(candidates) > top_k:
+                    trace = GenerationTrace(kind=RANKING, candidates=len(candidates), top_k=top_k, embedder=candidate_index.embedder.name)
+                    with trace.span("rank_candidates"):
+                        ranking = rank_candidates(candidate_index, job_description, [compacted for _, _, compacted in candidates], top_k)
+                    metrics_store.record(trace)
+                    st.session_state.batch_ranking = [{"candidate": candidates[position][0], "match score": round(score, 3)} for position, score in ranking]
+                    candidates = [candidates[position] for position, _ in ranking]
+
+                # Each candidate becomes a job on the batch queue; identical candidates share one job
+                history_meta = {"role_title": role_title, "company_name": company_name}
+                for file_name, candidate_profile, compacted_profile in candidates:
+                    token_report = {
+                        "tokens_before": count_tokens(candidate_profile) + job_description_tokens_before,
+                        "tokens_after": count_tokens(compacted_profile) + job_description_tokens_after,
+                    }
+                    quota_events = consume_quota()
+                    if quota_events is None:
+                        batch_jobs.append({"result": {"file_name": file_name, "error": "Your plan's generation limit has been reached."}})
+                        continue
+                    job_key = make_cache_key("batch", MODEL_ROUTES, PROMPT_VERSION, compacted_profile, job_description, recruiter_name, company_name, role_title)
+                    job_id = batch_job_queue.submit(job_key, generate_outreach_with_backoff, compacted_profile, job_description, recruiter_name, company_name, role_title, token_report=token_report)
+                    batch_jobs.append({"job_id": job_id, "file_name": file_name, "token_report": token_report, "quota_events": quota_events,
+                                       "history_meta": history_meta, "result": None})
+                st.session_state.batch_jobs = batch_jobs
+
+        if st.session_state.batch_ranking:
+            with st.expander(f"🎯 Top {len(st.session_state.batch_ranking)} matches for this job description"):
+                st.dataframe(st.session_state.batch_ranking, use_container_width=True, hide_index=True)
+
+        if st.session_state.batch_jobs:
+            show_batch_jobs()
+        elif st.session_state.batch_results:
+            results = st.session_state.batch_results
+            failed = sum(1 for result in results if "error" in result)
+            st.success(f"Generated outreach for {len(results) - failed} of {len(results)} candidates.")
+            succeeded = [result for result in results if "error" not in result]
+            if succeeded:
+                show_token_report({"tokens_before": sum(result["tokens_before"] for result in succeeded),
+                                   "tokens_after": sum(result["tokens_after"] for result in succeeded)})
+            export_col1, export_col2 = st.columns(2)
+            with export_col1:
+                st.download_button("Download CSV", batch_results_to_csv(results), file_name="talentreach_batch.csv", mime="text/csv", use_container_width=True)
+            with export_col2:
+                st.download_button("Download JSONL", batch_results_to_jsonl(results), file_name="talentreach_batch.jsonl", mime="application/jsonl", use_container_width=True)
+            for result in results:
+                show_batch_result(result)
+        elif not generate_button:
+            st.info("Each candidate's outreach will appear here as soon as it is ready.")
+
+@st.fragment(run_every=BATCH_POLL_INTERVAL_SECONDS)
+def show_batch_jobs():
+    """Polls this session's batch jobs, showing each candidate's result as soon as it finishes."""
+    batch_jobs = st.session_state.batch_jobs
+    for entry in batch_jobs:
+        if entry["result"] is not None:
+            continue
+        job = batch_job_queue.get(entry["job_id"])
+        if job is None or job.error:
+            entry["result"] = {"file_name": entry["file_name"], "error": str(job.error) if job else "The generation expired before it could be collected."}
+            release_quota(entry["quota_events"])
+        elif job.finished:
+            entry["result"] = {"file_name": entry["file_name"], **job.result, **entry["token_report"]}
+            record_history(job.result, entry["history_meta"])
+
+    finished = [entry["result"] for entry in batch_jobs if entry["result"] is not None]
+    if len(finished) == len(batch_jobs):
+        st.session_state.batch_results = finished
+        st.session_state.batch_jobs = None
+        st.rerun()
+
+    st.progress(len(finished) / len(batch_jobs), text=f"{len(finished)} of {len(batch_jobs)} candidates done")
+    for result in finished:
+        show_batch_result(result)
+
+def show_metrics_dashboard():
+    """Admin-only view of generation latency, token usage and cache behaviour over time."""
+    show_header()
+    st.markdown("<h4 style='text-align: center;'>📈 Generation Metrics</h4>", unsafe_allow_html=True)
+
+    windows = {"Last 24 hours": (24 * 3600, 3600), "Last 7 days": (7 * 24 * 3600, 6 * 3600), "Last 30 days": (30 * 24 * 3600, 24 * 3600)}
+    window = st.selectbox("Time window", list(windows), key="metrics_window")
+    window_seconds, bucket_seconds = windows[window]
+    since = time.time() - window_seconds
+
+    records = metrics_store.fetch(GENERATION, since)
+    if not records:
+        st.info("No generations recorded in this window yet.")
+        return
+
+    summary = summarize(records)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Generations", f"{summary['count']:,}")
+    col2.metric("p50 latency", f"{summary['p50_ms'] / 1000:.2f}s" if summary['p50_ms'] is not None else "—")
+    col3.metric("p95 latency", f"{summary['p95_ms'] / 1000:.2f}s" if summary['p95_ms'] is not None else "—")
+    col4.metric("p99 latency", f"{summary['p99_ms'] / 1000:.2f}s" if summary['p99_ms'] is not None else "—")
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Avg prompt tokens", f"{summary['avg_prompt_tokens']:,.0f}")
+    col2.metric("Avg completion tokens", f"{summary['avg_completion_tokens']:,.0f}")
+    col3.metric("Cache hit rate", f"{summary['cache_hit_rate']:.0%}")
+    col4.metric("Error rate", f"{summary['error_rate']:.0%}")
+
+    buckets = bucket_over_time(records, bucket_seconds)
+    times = [datetime.datetime.fromtimestamp(start) for start, _ in buckets]
+    st.markdown("**Latency over time (seconds)**")
+    st.line_chart({"time": times,
+                   "p50": [(b["p50_ms"] or 0) / 1000 for _, b in buckets],
+                   "p95": [(b["p95_ms"] or 0) / 1000 for _, b in buckets],
+                   "p99": [(b["p99_ms"] or 0) / 1000 for _, b in buckets]}, x="time")
+    st.markdown("**Tokens per generation**")
+    st.line_chart({"time": times,
+                   "prompt": [b["avg_prompt_tokens"] for _, b in buckets],
+                   "completion": [b["avg_completion_tokens"] for _, b in buckets]}, x="time")
+
+    st.markdown("**Where the time goes**")
+    spans = summarize_spans(records + metrics_store.fetch(PDF_EXTRACTION, since) + metrics_store.fetch(RANKING, since))
+    st.dataframe([{"span": name, "count": s["count"], "p50 ms": round(s["p50_ms"]), "p95 ms": round(s["p95_ms"]), "p99 ms": round(s["p99_ms"])}
+                  for name, s in spans.items()], use_container_width=True, hide_index=True)
+
+    st.markdown("**Model routes**")
+    routes = summarize_routes(records)
+    st.dataframe([{"stage": stage, "model": model, "calls": r["count"], "p50 ms": round(r["p50_ms"]), "p95 ms": round(r["p95_ms"]),
+                   "p99 ms": round(r["p99_ms"]), "p95 first token ms": round(r["p95_first_token_ms"]), "hedged": f"{r['hedge_rate']:.0%}",
+                   "fallback": f"{r['fallback_rate']:.0%}", "cost $": round(r["total_cost_usd"], 4) if r["total_cost_usd"] is not None else None}
+                  for (stage, model), r in routes.items()], use_container_width=True, hide_index=True)
+    st.caption("Circuit breakers (this process)")
+    st.dataframe(model_router.status(), use_container_width=True, hide_index=True)
 
 # -----------------------------------------------------------------
 # 5. MAIN ROUTER
@@ -364,8 +1219,22 @@ if authentication_status:
     # --- USER IS LOGGED IN ---
     with st.sidebar:
         st.title(f"Welcome {name}!")
+        modes = ["Single Candidate", "Batch"] + (["Metrics"] if username in ADMIN_USERNAMES else [])
+        mode = st.radio("Mode", modes, key="mode")
         authenticator.logout('Logout', 'main')
-    run_main_app()
+        cache_stats = generation_cache.stats()
+        st.caption(f"Generation cache: {cache_stats['hits']} hits / {cache_stats['misses']} misses on full outputs, {cache_stats['entries']} entries stored")
+        quota_subject, quota_limit, quota_window = current_quota()
+        if quota_limit is not None:
+            st.caption(f"Generations used: {quota_store.usage(quota_subject, quota_window)} of {quota_limit} in the last {quota_window / (24 * 3600):g} days")
+        st.subheader("🕘 History")
+        show_history()
+    if mode == "Batch":
+        run_batch_app()
+    elif mode == "Metrics":
+        show_metrics_dashboard()
+    else:
+        run_main_app()
 
 elif authentication_status == False:
     # --- FAILED LOGIN ---
@@ -374,12 +1243,14 @@ elif authentication_status == False:
 
 elif authentication_status == None:
     # --- NO ONE IS LOGGED IN (NEW OR GATED VISITOR) ---
-    # Get the current generation count from the cookie, default to 0 if not found
-    generation_count = int(cookies.get('generation_count', 0))
+    # The count is kept server-side per visitor cookie, and per address when a trusted proxy reports it
+    store_visitor_cookie()
+    remaining = remaining_generations()
 
-    if generation_count > 3:
+    # A visitor whose last free generation is still running or on screen gets to see it first
+    if remaining == 0 and not st.session_state.get('job_id') and not st.session_state.get('output'):
         show_paywall()
     else:
         # Display the remaining count for the user
-        st.info(f"You have {3 - generation_count} free generations remaining.")
+        st.info(f"You have {remaining} free generations remaining.")
         run_main_app()
\ No newline at end of file
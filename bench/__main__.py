@@ -0,0 +1,32 @@
+"""Benchmark and load-test harness. Run from the repository root:
+
+    python -m bench corpus                    # write the synthetic PDFs to bench/corpus
+    python -m bench micro                     # PDF extraction, compaction and parsing timings
+    python -m bench mock-server --port 8765   # stand-alone OpenAI stand-in
+    python -m bench load --sessions 16        # concurrent Streamlit sessions against the stand-in
+    python -m bench compare old.json new.json # exit status 1 on a regression
+"""
+import argparse
+
+from bench import corpus, load, micro, mock_openai, results
+
+COMMANDS = {
+    "corpus": (corpus.add_arguments, corpus.main, "generate the synthetic resume/JD PDFs"),
+    "micro": (micro.add_arguments, micro.main, "run the micro-benchmarks"),
+    "mock-server": (mock_openai.add_arguments, mock_openai.main, "serve the mock OpenAI API"),
+    "load": (load.add_arguments, load.main, "run the end-to-end load test"),
+    "compare": (results.add_compare_arguments, results.compare_main, "compare two results files"),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, (add_arguments, _, help_text) in COMMANDS.items():
+        add_arguments(subparsers.add_parser(name, help=help_text))
+    args = parser.parse_args()
+    COMMANDS[args.command][1](args)
+
+
+if __name__ == "__main__":
+    main()
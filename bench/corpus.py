@@ -0,0 +1,109 @@
+# -----------------------------------------------------------------
+# SYNTHETIC CORPUS
+# Deterministic resume and job-description PDFs of several sizes, so
+# benchmark runs are comparable from one release to the next.
+# -----------------------------------------------------------------
+import os
+import random
+
+import fitz  # PyMuPDF
+
+# Page counts for the generated documents; long ones exercise the page/char caps and parallel extraction
+CORPUS_PAGE_COUNTS = (1, 3, 10, 30)
+CORPUS_SEED = 1234
+
+FIRST_NAMES = ["Jordan", "Avery", "Priya", "Mateo", "Chen", "Amara", "Lukas", "Sofia", "Kwame", "Hana"]
+LAST_NAMES = ["Example", "Okafor", "Lindqvist", "Ramirez", "Nakamura", "Haddad", "Novak", "Mensah", "Ibrahim", "Park"]
+COMPANIES = ["Northwind", "Contoso", "Globex", "Initech", "Umbrella Labs", "Hooli", "Stark Analytics", "Wayne Systems"]
+TITLES = ["Software Engineer", "Senior Data Scientist", "ML Engineer", "Backend Engineer", "Platform Lead", "Staff Engineer"]
+SKILLS = ["Python", "SQL", "Kubernetes", "PyTorch", "distributed systems", "LLM applications", "data pipelines",
+          "AWS", "GCP", "TypeScript", "Go", "Spark", "Airflow", "team leadership", "system design"]
+VERBS = ["Led", "Built", "Designed", "Shipped", "Scaled", "Migrated", "Automated", "Mentored", "Reduced", "Improved"]
+OBJECTS = ["the recommendation pipeline", "a real-time analytics platform", "the billing service", "an internal LLM gateway",
+           "the search ranking stack", "a feature store", "the onboarding flow", "CI/CD for 40 services"]
+OUTCOMES = ["cutting latency by 40%", "saving $200k per year", "raising conversion by 12%", "serving 10M requests a day",
+            "halving on-call pages", "with zero downtime", "across three regions", "for 2,000 enterprise customers"]
+
+BOILERPLATE = ("We are an equal opportunity employer and value diversity. All qualified applicants will receive "
+               "consideration for employment without regard to race, religion, sex, national origin, age, or disability. "
+               "Reasonable accommodation is available to applicants with disabilities upon request.")
+
+
+def _resume_pages(rng, pages):
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    lines = [name, f"{rng.choice(TITLES)} | {name.split()[0].lower()}@example.com | +1 555 0100", "",
+             "Summary", f"{rng.choice(TITLES)} with {rng.randint(3, 15)} years of experience in {', '.join(rng.sample(SKILLS, 3))}.", ""]
+    body = [lines]
+    for page in range(pages):
+        section = ["Experience"] if page == 0 else []
+        for _ in range(6):
+            section.append(f"{rng.choice(TITLES)}, {rng.choice(COMPANIES)} ({rng.randint(2008, 2024)})")
+            for _ in range(4):
+                section.append(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)}, {rng.choice(OUTCOMES)}.")
+            section.append("")
+        if page == pages - 1:
+            section += ["Education", "B.S. Computer Science, State University", "", "Skills", ", ".join(rng.sample(SKILLS, 8))]
+        body.append(section)
+    # The first block shares a page with the first experience section
+    return [body[0] + body[1]] + body[2:]
+
+
+def _job_description_pages(rng, pages):
+    company, title = rng.choice(COMPANIES), rng.choice(TITLES)
+    body = []
+    for page in range(pages):
+        section = [f"{title} at {company}", "", "About the Role",
+                   f"{company} is hiring a {title} to build {rng.choice(OBJECTS)}.", ""] if page == 0 else []
+        section += ["Responsibilities"] if page == 0 else []
+        for _ in range(20):
+            section.append(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(OUTCOMES)}.")
+        section += ["", "Requirements"] + [f"- {rng.randint(2, 8)}+ years with {skill}" for skill in rng.sample(SKILLS, 5)]
+        section += ["", "Benefits", "Health, dental and vision cover; 401(k) match; remote-friendly.", "", "Equal Opportunity", BOILERPLATE]
+        body.append(section)
+    return body
+
+
+def _write_pdf(path, pages, header):
+    doc = fitz.open()
+    for number, lines in enumerate(pages, start=1):
+        page = doc.new_page()
+        # A running header and page footer, like real exports, for the header/footer stripping to find
+        page.insert_text((72, 40), header, fontsize=8)
+        page.insert_textbox(fitz.Rect(72, 60, 540, 760), "\n".join(lines), fontsize=9)
+        page.insert_text((280, 790), f"Page {number} of {len(pages)}", fontsize=8)
+    doc.save(path)
+    doc.close()
+
+
+def build_corpus(out_dir, page_counts=CORPUS_PAGE_COUNTS, seed=CORPUS_SEED):
+    """Writes one resume and one job description PDF per page count; returns {name: path}."""
+    os.makedirs(out_dir, exist_ok=True)
+    paths = {}
+    for pages in page_counts:
+        rng = random.Random(seed + pages)
+        for kind, make_pages, header in (("resume", _resume_pages, "Curriculum Vitae"), ("jd", _job_description_pages, "Careers")):
+            name = f"{kind}_{pages}p"
+            paths[name] = os.path.join(out_dir, f"{name}.pdf")
+            _write_pdf(paths[name], make_pages(rng, pages), header)
+    return paths
+
+
+def load_corpus(out_dir, page_counts=CORPUS_PAGE_COUNTS, seed=CORPUS_SEED):
+    """Returns {name: pdf bytes}, generating the corpus first if any file is missing."""
+    expected = [os.path.join(out_dir, f"{kind}_{pages}p.pdf") for pages in page_counts for kind in ("resume", "jd")]
+    paths = build_corpus(out_dir, page_counts, seed) if not all(map(os.path.exists, expected)) else {
+        os.path.basename(path)[:-4]: path for path in expected}
+    corpus = {}
+    for name, path in paths.items():
+        with open(path, "rb") as f:
+            corpus[name] = f.read()
+    return corpus
+
+
+def add_arguments(parser):
+    parser.add_argument("--out", default="bench/corpus", help="directory for the generated PDFs")
+
+
+def main(args):
+    for name, path in build_corpus(args.out).items():
+        print(f"{name}: {path} ({os.path.getsize(path)} bytes)")
@@ -0,0 +1,184 @@
+# -----------------------------------------------------------------
+# END-TO-END LOAD DRIVER
+# Runs N concurrent headless Streamlit sessions (streamlit.testing AppTest)
+# through login -> paste inputs -> Generate -> collect output, against the
+# mock OpenAI server, and reports session latency, throughput and the
+# server-side spans the app itself recorded.
+# -----------------------------------------------------------------
+import os
+import tempfile
+import threading
+import time
+
+import bcrypt
+from streamlit.testing.v1 import AppTest
+
+from bench import mock_openai
+from bench.corpus import load_corpus
+from bench.micro import extract_all_pages
+from bench.results import summarize_timings, write_results
+from metrics import GENERATION, MetricsStore, summarize, summarize_routes, summarize_spans
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+BENCH_USERNAME = "bench"
+BENCH_PASSWORD = "bench-password"
+
+# How often a waiting session reruns to collect its job, like the fragment's run_every
+SESSION_POLL_SECONDS = 0.25
+SESSION_TIMEOUT_SECONDS = 120
+
+# AppTest patches process-global Streamlit state (secrets, the runtime) for the length of a
+# script run, so runs are taken one at a time. The generations themselves still overlap:
+# they execute on the app's shared job queue, exactly as with a real server.
+_script_run_lock = threading.Lock()
+
+
+def _run_script(at):
+    with _script_run_lock:
+        at.run()
+
+
+def app_secrets(base_url, work_dir, password_hash, output_format="tagged"):
+    """Secrets for a bench session: the mock server, throwaway cache/metrics/quota/history DBs and one bench login."""
+    return {
+        "OPENAI_API_KEY": "sk-bench",
+        "OUTPUT_FORMAT": output_format,
+        "OPENAI_BASE_URL": base_url,
+        "GENERATION_CACHE_PATH": os.path.join(work_dir, "generation_cache.db"),
+        "METRICS_DB_PATH": os.path.join(work_dir, "metrics.db"),
+        "QUOTA_DB_PATH": os.path.join(work_dir, "quota.db"),
+        "HISTORY_DB_PATH": os.path.join(work_dir, "history.db"),
+        "credentials": {"usernames": {BENCH_USERNAME: {"email": "bench@example.com", "name": "Bench", "password": password_hash}}},
+        "cookie": {"name": "talentreach_bench", "key": "bench-cookie-signature-key", "expiry_days": 1},
+    }
+
+
+def _find(elements, label):
+    return next(element for element in elements if element.label == label)
+
+
+def run_session(session_index, secrets, inputs, requests_per_session, results):
+    """One simulated user: logs in, then generates requests_per_session times, waiting for each result."""
+    try:
+        _run_session(session_index, secrets, inputs, requests_per_session, results)
+    except Exception as e:
+        results.append({"session": session_index, "request": None, "latency_ms": None, "error": f"{type(e).__name__}: {e}"})
+
+
+def _run_session(session_index, secrets, inputs, requests_per_session, results):
+    at = AppTest.from_file(APP_PATH, default_timeout=SESSION_TIMEOUT_SECONDS)
+    for name, value in secrets.items():
+        at.secrets[name] = value
+    _run_script(at)
+    _find(at.text_input, "Username").input(BENCH_USERNAME)
+    _find(at.text_input, "Password").input(BENCH_PASSWORD)
+    _find(at.button, "Login").click()
+    _run_script(at)
+
+    profile, job_description = inputs
+    for request_index in range(requests_per_session):
+        at.text_area(key="candidate_text").input(profile)
+        at.text_area(key="job_text").input(job_description)
+        # A different recruiter name per request, so the whole-output cache does not answer repeats
+        _find(at.text_input, "Your Name (Recruiter)").input(f"Recruiter {session_index}-{request_index}")
+        _find(at.text_input, "Company Name").input("Acme")
+        _find(at.text_input, "Role Title").input("Senior AI Engineer")
+
+        start = time.perf_counter()
+        _find(at.button, "✨ Generate Messages").click()
+        _run_script(at)
+        deadline = time.monotonic() + SESSION_TIMEOUT_SECONDS
+        while at.session_state["job_id"] and time.monotonic() < deadline:
+            time.sleep(SESSION_POLL_SECONDS)
+            _run_script(at)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        error = at.session_state["generation_error"] if "generation_error" in at.session_state else None
+        if at.exception:
+            error = at.exception[0].message
+        elif at.session_state["job_id"]:
+            error = "timed out"
+        elif not error and not at.session_state["output"]:
+            error = "no output"
+        results.append({"session": session_index, "request": request_index, "latency_ms": elapsed_ms, "error": error})
+
+
+def run_load(sessions, requests_per_session, base_url, corpus, distinct_profiles, output_format="tagged"):
+    """Runs the sessions concurrently and returns (per-request results, wall time in seconds, app metrics records)."""
+    resumes = [extract_all_pages(pdf_bytes) for name, pdf_bytes in sorted(corpus.items()) if name.startswith("resume")]
+    job_description = extract_all_pages(corpus["jd_1p"])
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+
+    with tempfile.TemporaryDirectory(prefix="talentreach-bench-") as work_dir:
+        secrets = app_secrets(base_url, work_dir, password_hash, output_format)
+        results, threads = [], []
+        started_at = time.time()
+        start = time.perf_counter()
+        for index in range(sessions):
+            # Profiles past the first distinct_profiles repeat, so later sessions can hit the profile cache
+            profile_index = index % distinct_profiles
+            profile = f"{resumes[profile_index % len(resumes)]}\nCandidate reference: {profile_index}"
+            thread = threading.Thread(target=run_session, args=(index, secrets, (profile, job_description), requests_per_session, results))
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        wall_seconds = time.perf_counter() - start
+        records = MetricsStore(secrets["METRICS_DB_PATH"]).fetch(GENERATION, started_at)
+    return results, wall_seconds, records
+
+
+def add_arguments(parser):
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--requests-per-session", type=int, default=2)
+    parser.add_argument("--distinct-profiles", type=int, default=None, help="distinct candidate profiles (default: one per session)")
+    parser.add_argument("--output-format", choices=("tagged", "json"), default="tagged", help="the app's OUTPUT_FORMAT")
+    parser.add_argument("--base-url", default=None, help="an already running OpenAI-compatible server; by default a mock is started")
+    parser.add_argument("--corpus", default="bench/corpus")
+    parser.add_argument("--out", default="bench/results/load.json")
+    mock_openai.add_arguments(parser)
+
+
+def main(args):
+    server = None
+    base_url = args.base_url
+    settings = mock_openai.settings_from_args(args)
+    if base_url is None:
+        server, base_url = mock_openai.start_mock_server(0, settings)
+
+    try:
+        results, wall_seconds, records = run_load(args.sessions, args.requests_per_session, base_url, load_corpus(args.corpus),
+                                                  args.distinct_profiles or args.sessions, args.output_format)
+    finally:
+        if server is not None:
+            server.shutdown()
+
+    succeeded = [r["latency_ms"] for r in results if not r["error"]]
+    errors = [r for r in results if r["error"]]
+    benchmarks = {
+        "session_generate": {**summarize_timings(succeeded), "throughput_per_s": len(succeeded) / wall_seconds,
+                             "errors": len(errors), "wall_seconds": wall_seconds},
+    }
+    for name, stats in summarize_spans(records).items():
+        benchmarks[f"span[{name}]"] = {"samples": stats["count"], "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"], "p99_ms": stats["p99_ms"]}
+    for (stage, model), stats in summarize_routes(records).items():
+        benchmarks[f"route[{stage}:{model}]"] = {"samples": stats["count"], "p50_ms": stats["p50_ms"], "p95_ms": stats["p95_ms"],
+                                                 "p99_ms": stats["p99_ms"], "hedge_rate": stats["hedge_rate"],
+                                                 "fallback_rate": stats["fallback_rate"], "total_cost_usd": stats["total_cost_usd"]}
+    app_summary = summarize(records)
+    config = {"sessions": args.sessions, "requests_per_session": args.requests_per_session,
+              "distinct_profiles": args.distinct_profiles or args.sessions, "output_format": args.output_format,
+              "external_server": args.base_url is not None,
+              "mock_latency": settings.latency, "mock_tokens_per_second": settings.tokens_per_second,
+              "mock_error_rate": settings.error_rate, "mock_requests": settings.requests if server else None,
+              "app_cache_hit_rate": app_summary["cache_hit_rate"], "app_avg_prompt_tokens": app_summary["avg_prompt_tokens"]}
+    write_results(args.out, "load", benchmarks, config)
+
+    stats = benchmarks["session_generate"]
+    print(f"{len(results)} generations from {args.sessions} sessions in {wall_seconds:.1f}s "
+          f"({stats['throughput_per_s']:.2f}/s, {len(errors)} errors)")
+    if succeeded:
+        print(f"session latency p50 {stats['p50_ms']:.0f}ms  p95 {stats['p95_ms']:.0f}ms  max {stats['max_ms']:.0f}ms")
+    for error in errors[:5]:
+        print(f"  session {error['session']} request {error['request']}: {error['error']}")
+    print(f"Results written to {args.out}")
@@ -0,0 +1,140 @@
+# -----------------------------------------------------------------
+# MICRO-BENCHMARKS
+# Times the CPU-bound steps of a generation (PDF extraction, prompt
+# compaction, output parsing, ranking) and history lookups on the
+# synthetic corpus, with no API calls.
+# -----------------------------------------------------------------
+import os
+import random
+import tempfile
+
+import fitz
+
+from bench.corpus import load_corpus
+from bench.mock_openai import CANNED_MESSAGES, CANNED_PROFILE_SUMMARY, CANNED_STRUCTURED_OUTPUT
+from bench.results import summarize_timings, time_calls, write_results
+from candidate_index import CandidateIndex, HashingEmbedder, rank_candidates
+from history_store import HistoryStore
+from output_parser import StreamingOutputParser, parse_ai_output, parse_structured_output
+from pdf_extraction import extract_pdf_text
+from prompt_compaction import compact_text
+
+# The app's defaults (PDF_MAX_PAGES, PDF_MAX_CHARS, PROFILE_TOKEN_BUDGET, JOB_DESCRIPTION_TOKEN_BUDGET)
+PDF_MAX_PAGES = 20
+PDF_MAX_CHARS = 30000
+PROFILE_TOKEN_BUDGET = 3000
+JOB_DESCRIPTION_TOKEN_BUDGET = 1500
+
+# Roughly what one streamed delta carries
+STREAM_CHUNK_CHARS = 16
+
+AI_OUTPUT = f"{CANNED_PROFILE_SUMMARY}\n{CANNED_MESSAGES}"
+
+# Size of the candidate pool ranked against one job description
+RANKING_POOL_SIZE = 1000
+RANKING_TOP_K = 25
+
+# Generations in one user's history when timing listing, search and re-display
+HISTORY_SIZE = 20000
+HISTORY_PAGE_SIZE = 20
+
+
+def extract_all_pages(pdf_bytes):
+    """Uncapped, single-process extraction: the reference the capped/parallel path is measured against."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as doc:
+        return "".join(page.get_text() for page in doc)
+
+
+def stream_parse(text):
+    parser = StreamingOutputParser()
+    for start in range(0, len(text), STREAM_CHUNK_CHARS):
+        parser.feed(text[start:start + STREAM_CHUNK_CHARS])
+    return parser.result()
+
+
+# Outputs the streaming parser must agree with parse_ai_output on, however the stream is chunked
+PARSER_CHECK_OUTPUTS = [
+    AI_OUTPUT,
+    "[CANDIDATE_NAME]Jane Doe\n[KEY_POINTS]- 8 years of Python\n[OUTREACH_MESSAGES]\n1. Hi Jane\n2. Hello\n3. Hey\n[EMAIL_MESSAGE]Dear Jane",
+    "[KEY_POINTS]Only points [END_KEY_POINTS] text [link] [END_EMAIL_MESSAGE] [CANDIDATE_NAME]Late Name[END_CANDIDATE_NAME][KEY_POINTS]again",
+    "No markers at all [ [END_ [CANDIDATE_NAME",
+]
+PARSER_CHECK_TRIALS = 200
+
+
+def check_streaming_parser(outputs=PARSER_CHECK_OUTPUTS, trials=PARSER_CHECK_TRIALS, seed=0):
+    """Feeds each output in random chunkings; the last snapshot and result() must both equal parse_ai_output."""
+    rng = random.Random(seed)
+    for text in outputs:
+        expected = parse_ai_output(text)
+        for _ in range(trials):
+            parser, position, snapshot = StreamingOutputParser(), 0, None
+            while position < len(text):
+                size = rng.randint(1, 24)
+                snapshot = parser.feed(text[position:position + size])
+                position += size
+            if snapshot != expected or parser.result() != expected:
+                raise AssertionError(f"StreamingOutputParser disagrees with parse_ai_output on {text[:40]!r}: {snapshot!r}")
+
+
+def run_micro_benchmarks(corpus, repeat):
+    """Returns {benchmark name: timing stats}."""
+    # Timing a parser that gives the wrong answer would be meaningless
+    check_streaming_parser()
+    benchmarks = {}
+
+    def bench(name, fn, samples=repeat, warmup=1, **extra):
+        benchmarks[name] = {**summarize_timings(time_calls(fn, samples, warmup)), **extra}
+
+    for name, pdf_bytes in sorted(corpus.items()):
+        # extract_text_from_pdf in app.py adds only Streamlit caching on top of extract_pdf_text
+        bench(f"extract_pdf_text[{name}]", lambda b=pdf_bytes: extract_pdf_text(b, max_pages=PDF_MAX_PAGES, max_chars=PDF_MAX_CHARS),
+              file_bytes=len(pdf_bytes))
+        bench(f"extract_all_pages[{name}]", lambda b=pdf_bytes: extract_all_pages(b), file_bytes=len(pdf_bytes))
+        text = extract_all_pages(pdf_bytes)
+        budget = PROFILE_TOKEN_BUDGET if name.startswith("resume") else JOB_DESCRIPTION_TOKEN_BUDGET
+        bench(f"compact_text[{name}]", lambda t=text, b=budget: compact_text(t, b), input_chars=len(text))
+
+    # Ranking: embedding a fresh pool (cold) versus scoring one already in the index (warm)
+    resumes = [extract_all_pages(pdf_bytes) for name, pdf_bytes in sorted(corpus.items()) if name.startswith("resume")]
+    job_description = extract_all_pages(corpus["jd_1p"])
+    pool = [f"{resumes[i % len(resumes)]}\nCandidate reference: {i}" for i in range(RANKING_POOL_SIZE)]
+    with tempfile.TemporaryDirectory() as index_dir:
+        bench(f"rank_candidates_cold[{RANKING_POOL_SIZE}]", lambda: rank_candidates(CandidateIndex(tempfile.mkdtemp(dir=index_dir), HashingEmbedder()),
+                                                                              job_description, pool, RANKING_TOP_K), samples=max(1, repeat // 10), warmup=0)
+        index = CandidateIndex(index_dir, HashingEmbedder())
+        index.add(pool)
+        bench(f"rank_candidates_warm[{RANKING_POOL_SIZE}]", lambda: rank_candidates(index, job_description, pool, RANKING_TOP_K))
+
+    # History: the first and a deep page, a search, and opening one entry, against one long history
+    history_output = parse_structured_output(CANNED_STRUCTURED_OUTPUT)
+    with tempfile.TemporaryDirectory() as history_dir:
+        history = HistoryStore(os.path.join(history_dir, "history.db"))
+        for i in range(HISTORY_SIZE):
+            history.add("user:bench", {**history_output, "name": f"Candidate {i}"}, role_title="Engineer", company_name="Bench")
+        deep_id = history.page("user:bench", limit=HISTORY_SIZE // 2)[-1]["id"]
+        bench(f"history_page[{HISTORY_SIZE}]", lambda: history.page("user:bench", limit=HISTORY_PAGE_SIZE), samples=repeat * 10)
+        bench(f"history_page_deep[{HISTORY_SIZE}]", lambda: history.page("user:bench", before_id=deep_id, limit=HISTORY_PAGE_SIZE), samples=repeat * 10)
+        bench(f"history_search[{HISTORY_SIZE}]", lambda: history.page("user:bench", "candidate 1234", limit=HISTORY_PAGE_SIZE), samples=repeat * 10)
+        bench(f"history_get[{HISTORY_SIZE}]", lambda: history.get("user:bench", deep_id), samples=repeat * 10)
+
+    # Parsing is sub-millisecond, so it gets more samples for stable percentiles
+    bench("parse_ai_output", lambda: parse_ai_output(AI_OUTPUT), samples=repeat * 50, input_chars=len(AI_OUTPUT))
+    bench("parse_structured_output", lambda: parse_structured_output(CANNED_STRUCTURED_OUTPUT), samples=repeat * 50,
+          input_chars=len(CANNED_STRUCTURED_OUTPUT))
+    bench("streaming_parser", lambda: stream_parse(AI_OUTPUT), samples=repeat * 10, input_chars=len(AI_OUTPUT))
+    return benchmarks
+
+
+def add_arguments(parser):
+    parser.add_argument("--corpus", default="bench/corpus", help="directory of corpus PDFs (generated if missing)")
+    parser.add_argument("--repeat", type=int, default=20, help="timed runs per benchmark")
+    parser.add_argument("--out", default="bench/results/micro.json", help="where to write the JSON results")
+
+
+def main(args):
+    benchmarks = run_micro_benchmarks(load_corpus(args.corpus), args.repeat)
+    write_results(args.out, "micro", benchmarks, {"repeat": args.repeat, "pdf_max_pages": PDF_MAX_PAGES, "pdf_max_chars": PDF_MAX_CHARS})
+    for name, stats in benchmarks.items():
+        print(f"{name:<40} p50 {stats['p50_ms']:9.3f}ms  p95 {stats['p95_ms']:9.3f}ms  ({stats['samples']} runs)")
+    print(f"Results written to {args.out}")
@@ -0,0 +1,207 @@
+# -----------------------------------------------------------------
+# LOCAL OPENAI STAND-IN
+# A tiny Chat Completions server that answers with canned outputs in the
+# app's tagged format, with configurable latency, streaming and errors.
+# Point the app at it with OPENAI_BASE_URL = "http://127.0.0.1:<port>/v1".
+# -----------------------------------------------------------------
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CANNED_JOB_ANALYSIS = """[JOB_ANALYSIS]
+**Role Summary:**
+A senior engineer who designs and ships LLM-backed product features end to end.
+
+**Key Requirements:**
+- 5+ years of backend engineering in Python
+- Production experience with large language models
+- Strong communication with product and design
+
+**Selling Points:**
+- Small team with direct impact on the product roadmap
+- Mission-driven company with strong growth
+[END_JOB_ANALYSIS]"""
+
+CANNED_PROFILE_SUMMARY = """[CANDIDATE_NAME]Jordan Example[END_CANDIDATE_NAME]
+[KEY_POINTS]
+**Educational Summary:**
+Jordan holds a B.S. in Computer Science from State University, with coursework in machine learning.
+
+**Experience Summary:**
+Jordan has eight years of backend and ML engineering experience across two startups, most recently leading an applied AI team.
+
+**Key Achievements:**
+- Led the rebuild of a recommendation pipeline that made the product noticeably faster for every user.
+- Mentored a team of five engineers through a major platform migration.
+
+**Skills:**
+- Python, distributed systems, LLM applications, team leadership
+[END_KEY_POINTS]"""
+
+CANNED_MESSAGES = """[OUTREACH_MESSAGES]
+1. Hi Jordan, I'm Sam from Acme. Your work rebuilding a recommendation pipeline caught my eye, and it maps closely to what our AI team is tackling. Would you be open to hearing more?
+2. Hi Jordan, I'm Sam from Acme. You clearly know how to make systems run far more smoothly, and our Senior AI Engineer role could use exactly that. Could we set up a quick 15-minute chat this week?
+3. Hi Jordan, I'm Sam from Acme. Given your experience leading applied AI work, would you be interested in a role at Acme as Senior AI Engineer?
+[END_OUTREACH_MESSAGES]
+[EMAIL_MESSAGE]
+**Subject:** Exploring opportunities at Acme
+
+Hi Jordan,
+
+I'm Sam, a recruiter at Acme. I came across your background and was impressed by how you helped your team's recommendation systems run far more efficiently while mentoring engineers through a large migration.
+
+At Acme we are building LLM-backed features that reach thousands of customers every day, and our Senior AI Engineer role sits right at the centre of that work. Your blend of hands-on engineering and leadership would give you real ownership of the roadmap on a small, fast-moving team.
+
+Would you be open to a brief chat to explore whether this could be a fit?
+
+Looking forward to hearing from you,
+Sam
+Acme
+[END_EMAIL_MESSAGE]"""
+
+CANNED_STRUCTURED_OUTPUT = json.dumps({
+    "candidate_name": "Jordan Example",
+    "key_points": CANNED_PROFILE_SUMMARY.split("[KEY_POINTS]")[1].split("[END_KEY_POINTS]")[0].strip(),
+    "short_messages": [line[3:] for line in CANNED_MESSAGES.splitlines() if line[:3] in ("1. ", "2. ", "3. ")],
+    "email_message": CANNED_MESSAGES.split("[EMAIL_MESSAGE]")[1].split("[END_EMAIL_MESSAGE]")[0].strip(),
+})
+
+
+def canned_output(messages, response_format=None):
+    """Picks the canned answer for a request, based on which prompt it carries."""
+    if response_format and response_format.get("type") == "json_schema":
+        return CANNED_STRUCTURED_OUTPUT
+    system_prompt = next((m["content"] for m in messages if m["role"] == "system"), "")
+    if "[JOB_ANALYSIS]" in system_prompt:
+        return CANNED_JOB_ANALYSIS
+    has_profile_steps, has_message_steps = "// STEP 0" in system_prompt, "// STEP 2" in system_prompt
+    if has_profile_steps and not has_message_steps:
+        return CANNED_PROFILE_SUMMARY
+    if has_message_steps and not has_profile_steps:
+        return CANNED_MESSAGES
+    return f"{CANNED_PROFILE_SUMMARY}\n{CANNED_MESSAGES}"
+
+
+def approximate_tokens(text):
+    return max(1, len(text) // 4)
+
+
+class MockSettings:
+    """Latency and failure knobs shared by all request handlers."""
+
+    def __init__(self, latency=0.5, jitter=0.1, tokens_per_second=200.0, error_rate=0.0, chunk_chars=16):
+        self.latency = latency
+        self.jitter = jitter
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.chunk_chars = chunk_chars
+        self.requests = 0
+        self._lock = threading.Lock()
+
+    def count_request(self):
+        with self._lock:
+            self.requests += 1
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    settings = MockSettings()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        settings = self.settings
+        settings.count_request()
+
+        if random.random() < settings.error_rate:
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_error"}}, {"retry-after": "0.2"})
+            return
+
+        content = canned_output(body.get("messages", []), body.get("response_format"))
+        # Time to first token, then generation at a fixed token rate
+        time.sleep(max(0.0, settings.latency + random.uniform(-settings.jitter, settings.jitter)))
+        prompt_tokens = sum(approximate_tokens(m.get("content") or "") for m in body.get("messages", []))
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": approximate_tokens(content),
+                 "total_tokens": prompt_tokens + approximate_tokens(content)}
+        completion_id, model, created = f"chatcmpl-{uuid.uuid4().hex[:12]}", body.get("model", "mock"), int(time.time())
+
+        if not body.get("stream"):
+            time.sleep(approximate_tokens(content) / settings.tokens_per_second)
+            self._send_json(200, {
+                "id": completion_id, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                "usage": usage,
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("cache-control", "no-cache")
+        self.send_header("connection", "close")
+        self.end_headers()
+        chunk_delay = approximate_tokens("x" * settings.chunk_chars) / settings.tokens_per_second
+
+        def send_chunk(choices, **extra):
+            payload = {"id": completion_id, "object": "chat.completion.chunk", "created": created, "model": model, "choices": choices, **extra}
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        send_chunk([{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}])
+        for start in range(0, len(content), settings.chunk_chars):
+            time.sleep(chunk_delay)
+            send_chunk([{"index": 0, "delta": {"content": content[start:start + settings.chunk_chars]}, "finish_reason": None}])
+        send_chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}])
+        if (body.get("stream_options") or {}).get("include_usage"):
+            send_chunk([], usage=usage)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _send_json(self, status, payload, headers=None):
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_mock_server(port=0, settings=None):
+    """Starts the mock server on a background thread and returns (server, base_url)."""
+    handler = type("ConfiguredMockOpenAIHandler", (MockOpenAIHandler,), {"settings": settings or MockSettings()})
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def add_arguments(parser):
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="seconds before the first token")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- seconds of random latency")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with HTTP 429")
+
+
+def settings_from_args(args):
+    return MockSettings(latency=args.latency, jitter=args.jitter, tokens_per_second=args.tokens_per_second, error_rate=args.error_rate)
+
+
+def main(args):
+    server, base_url = start_mock_server(args.port, settings_from_args(args))
+    print(f"Mock OpenAI server listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
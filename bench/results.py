@@ -0,0 +1,121 @@
+# -----------------------------------------------------------------
+# BENCHMARK RESULTS
+# Timing statistics, the JSON results file, and comparison of two
+# results files to catch regressions between releases.
+# -----------------------------------------------------------------
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from metrics import percentile
+
+RESULTS_SCHEMA_VERSION = 1
+
+# A benchmark whose p50 grows by more than this fraction counts as a regression
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+
+def summarize_timings(durations_ms):
+    """min/mean/p50/p95/p99/max in milliseconds for a list of samples."""
+    if not durations_ms:
+        return {"samples": 0}
+    return {
+        "samples": len(durations_ms),
+        "min_ms": min(durations_ms),
+        "mean_ms": statistics.fmean(durations_ms),
+        "p50_ms": percentile(durations_ms, 50),
+        "p95_ms": percentile(durations_ms, 95),
+        "p99_ms": percentile(durations_ms, 99),
+        "max_ms": max(durations_ms),
+    }
+
+
+def time_calls(fn, repeat, warmup=1):
+    """Calls fn warmup + repeat times and returns the timed durations in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        durations.append((time.perf_counter() - start) * 1000)
+    return durations
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def environment():
+    """What the numbers were measured on, so results from different machines are not compared blindly."""
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "git_revision": _git_revision(),
+    }
+
+
+def write_results(path, suite, benchmarks, config):
+    """Writes a results file: {"suite", "created_at", "environment", "config", "benchmarks": {name: stats}}."""
+    results = {
+        "schema_version": RESULTS_SCHEMA_VERSION,
+        "suite": suite,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": environment(),
+        "config": config,
+        "benchmarks": benchmarks,
+    }
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+    return results
+
+
+def compare_results(baseline, current, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Compares p50 (and throughput, where present) per benchmark; returns rows and whether any regressed."""
+    rows, regressed = [], False
+    for name, current_stats in sorted(current["benchmarks"].items()):
+        baseline_stats = baseline["benchmarks"].get(name)
+        if not baseline_stats or not baseline_stats.get("p50_ms") or current_stats.get("p50_ms") is None:
+            rows.append((name, None, current_stats.get("p50_ms"), None, "new"))
+            continue
+        change = current_stats["p50_ms"] / baseline_stats["p50_ms"] - 1
+        status = "regressed" if change > threshold else "improved" if change < -threshold else "ok"
+        if baseline_stats.get("throughput_per_s") and current_stats.get("throughput_per_s") is not None:
+            if current_stats["throughput_per_s"] < baseline_stats["throughput_per_s"] * (1 - threshold):
+                status = "regressed"
+        regressed = regressed or status == "regressed"
+        rows.append((name, baseline_stats["p50_ms"], current_stats["p50_ms"], change, status))
+    return rows, regressed
+
+
+def add_compare_arguments(parser):
+    parser.add_argument("baseline", help="results file from the previous release")
+    parser.add_argument("current", help="results file to check")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help="allowed p50 slowdown as a fraction (default 0.10)")
+
+
+def compare_main(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+    rows, regressed = compare_results(baseline, current, args.threshold)
+    print(f"{'benchmark':<48} {'baseline p50':>13} {'current p50':>13} {'change':>8}  status")
+    for name, before, after, change, status in rows:
+        before = f"{before:.2f}ms" if before is not None else "-"
+        after = f"{after:.2f}ms" if after is not None else "-"
+        change = f"{change:+.1%}" if change is not None else "-"
+        print(f"{name:<48} {before:>13} {after:>13} {change:>8}  {status}")
+    sys.exit(1 if regressed else 0)
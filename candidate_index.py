@@ -0,0 +1,227 @@
+# -----------------------------------------------------------------
+# CANDIDATE RANKING INDEX
+# Embeds candidate profiles and job descriptions and ranks candidates by
+# cosine similarity, so outreach is generated only for the best matches.
+# Vectors persist on disk, so a resume is embedded once however often
+# it is uploaded.
+# -----------------------------------------------------------------
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+HASHING_DIMENSIONS = 2048
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9][a-z0-9+#.\-]*[a-z0-9+#]|[a-z0-9]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it its of on or our that the their this to was we were will with "
+    "you your they he she his her them who which what when where how all any can into more most not other such than".split()
+)
+
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def _normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+class HashingEmbedder:
+    """Local, dependency-free embedder: hashed, log-weighted word and word-pair counts.
+
+    It needs no model download and no API call, and captures the skill/keyword
+    overlap that matters most for ranking resumes against a job description.
+    """
+
+    def __init__(self, dimensions=HASHING_DIMENSIONS):
+        self.dimensions = dimensions
+        self.name = f"hashing-{dimensions}"
+
+    def _features(self, text):
+        words = [word for word in TOKEN_PATTERN.findall(text.lower()) if word not in STOPWORDS]
+        return Counter(words + [f"{first} {second}" for first, second in zip(words, words[1:])])
+
+    def embed(self, texts):
+        matrix = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            features = self._features(text)
+            if not features:
+                continue
+            hashes = np.array([int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in features],
+                              dtype=np.uint64)
+            # The top hash bit picks the sign, so colliding features tend to cancel rather than pile up
+            signs = np.where(hashes >> np.uint64(63), 1.0, -1.0)
+            weights = np.array([1 + math.log(count) for count in features.values()])
+            np.add.at(matrix[row], (hashes % np.uint64(self.dimensions)).astype(np.int64), signs * weights)
+        return _normalize_rows(matrix)
+
+
+class SentenceTransformerEmbedder:
+    """Local neural embedder; requires the optional sentence-transformers package."""
+
+    def __init__(self, model_name="all-MiniLM-L6-v2"):
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError as e:
+            raise ImportError("EMBEDDING_PROVIDER 'sentence-transformers' needs `pip install sentence-transformers`.") from e
+        self._model = SentenceTransformer(model_name)
+        self.name = f"sentence-transformers-{model_name}"
+
+    def embed(self, texts):
+        return _normalize_rows(np.asarray(self._model.encode(list(texts), batch_size=32), dtype=np.float32))
+
+
+class OpenAIEmbedder:
+    """Embeddings from the OpenAI API, sent in batches through the app's shared client."""
+
+    BATCH_SIZE = 256
+
+    def __init__(self, client, model="text-embedding-3-small"):
+        self._client = client
+        self.model = model
+        self.name = f"openai-{model}"
+
+    def embed(self, texts):
+        vectors = []
+        for start in range(0, len(texts), self.BATCH_SIZE):
+            response = self._client.embeddings.create(model=self.model, input=list(texts[start:start + self.BATCH_SIZE]))
+            vectors.extend(item.embedding for item in sorted(response.data, key=lambda item: item.index))
+        return _normalize_rows(np.asarray(vectors, dtype=np.float32).reshape(len(texts), -1))
+
+
+class CandidateIndex:
+    """Persistent vector index of candidate profiles, keyed by a hash of their text.
+
+    Vectors live in one float32 matrix, so scoring a job description against
+    thousands of candidates is a single matrix-vector product. On disk they
+    are raw float32 rows (vectors.f32) next to their keys, one per line
+    (keys.txt); both files are only ever appended to, so adding candidates
+    writes just the new rows. meta.json names the embedder, and the index is
+    rebuilt from scratch if it changes, since vectors from different
+    embedders are not comparable.
+    """
+
+    def __init__(self, directory, embedder):
+        self.directory = directory
+        self.embedder = embedder
+        self._lock = threading.Lock()
+        self._meta_path = os.path.join(directory, "meta.json")
+        self._vectors_path = os.path.join(directory, "vectors.f32")
+        self._keys_path = os.path.join(directory, "keys.txt")
+        self._keys, self._matrix = [], None
+        self._load()
+        self._positions = {key: position for position, key in enumerate(self._keys)}
+
+    def _load(self):
+        try:
+            with open(self._meta_path) as f:
+                meta = json.load(f)
+            with open(self._keys_path) as f:
+                keys = f.read().split("\n")[:-1]
+            vectors = np.fromfile(self._vectors_path, dtype=np.float32)
+        except (OSError, ValueError):
+            return
+        if meta.get("embedder") != self.embedder.name:
+            return
+        dimensions = meta["dimensions"]
+        rows = vectors.size // dimensions
+        count = min(len(keys), rows)
+        self._keys, self._matrix = keys[:count], vectors[:count * dimensions].reshape(count, dimensions)
+        if count != len(keys) or count * dimensions != vectors.size:
+            # An append was interrupted; drop the unmatched tail so the files line up again
+            self._rewrite()
+
+    def _rewrite(self):
+        """Writes the whole index from memory, replacing whatever is on disk."""
+        os.makedirs(self.directory, exist_ok=True)
+        # Written to temporary files and swapped in, so a crash never leaves a half-written index
+        with open(self._vectors_path + ".tmp", "wb") as f:
+            self._vectors().tofile(f)
+        with open(self._keys_path + ".tmp", "w") as f:
+            f.write("".join(key + "\n" for key in self._keys))
+        with open(self._meta_path + ".tmp", "w") as f:
+            json.dump({"embedder": self.embedder.name, "dimensions": self._matrix.shape[1]}, f)
+        os.replace(self._vectors_path + ".tmp", self._vectors_path)
+        os.replace(self._keys_path + ".tmp", self._keys_path)
+        os.replace(self._meta_path + ".tmp", self._meta_path)
+
+    def _append(self, keys, vectors):
+        """Appends new rows to the files on disk; vectors go first, so keys never point past the matrix."""
+        with open(self._vectors_path, "ab") as f:
+            vectors.tofile(f)
+        with open(self._keys_path, "a") as f:
+            f.write("".join(key + "\n" for key in keys))
+
+    def _vectors(self):
+        return self._matrix[:len(self._keys)]
+
+    def __len__(self):
+        return len(self._keys)
+
+    def add(self, texts):
+        """Indexes the texts, embedding only those not seen before; returns their keys in order."""
+        keys = [content_hash(text) for text in texts]
+        with self._lock:
+            new = {key: text for key, text in zip(keys, texts) if key not in self._positions}
+        if not new:
+            return keys
+        # Embedding may be a network call, so it runs without the lock; searches carry on meanwhile
+        vectors = self.embedder.embed(list(new.values()))
+        with self._lock:
+            # Another caller may have added some of the same texts while these were embedded
+            fresh = [(row, key) for row, key in enumerate(new) if key not in self._positions]
+            if not fresh:
+                return keys
+            new_keys, vectors = [key for _, key in fresh], vectors[[row for row, _ in fresh]]
+            first_write = self._matrix is None
+            count = len(self._keys)
+            if first_write or count + len(new_keys) > len(self._matrix):
+                # Spare capacity doubles as the index grows, so adding a few rows does not copy the whole matrix
+                capacity = max(2 * (count + len(new_keys)), 64)
+                matrix = np.zeros((capacity, vectors.shape[1]), dtype=np.float32)
+                if not first_write:
+                    matrix[:count] = self._vectors()
+                self._matrix = matrix
+            self._matrix[count:count + len(new_keys)] = vectors
+            for key in new_keys:
+                self._positions[key] = len(self._keys)
+                self._keys.append(key)
+            if first_write:
+                self._rewrite()
+            else:
+                self._append(new_keys, vectors)
+        return keys
+
+    def search(self, query_text, k, keys=None):
+        """Returns up to k (key, cosine score) pairs, best first, optionally only among the given keys."""
+        query = self.embedder.embed([query_text])[0]
+        with self._lock:
+            if self._matrix is None:
+                return []
+            positions = np.array([self._positions[key] for key in keys if key in self._positions]) if keys is not None \
+                else np.arange(len(self._keys))
+            if positions.size == 0:
+                return []
+            scores = self._matrix[positions] @ query
+            candidate_keys = [self._keys[position] for position in positions]
+        k = min(k, scores.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(candidate_keys[i], float(scores[i])) for i in top]
+
+
+def rank_candidates(index, job_description, profiles, k):
+    """Indexes the profiles and returns (position in profiles, score) for the top k matches to the job description."""
+    keys = index.add(profiles)
+    first_position = {}
+    for position, key in enumerate(keys):
+        first_position.setdefault(key, position)
+    return [(first_position[key], score) for key, score in index.search(job_description, k, keys=list(first_position))]
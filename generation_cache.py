@@ -0,0 +1,144 @@
+# -----------------------------------------------------------------
+# GENERATION CACHE
+# Persistent, content-addressed store for parsed model outputs so that
+# identical requests (reruns, re-clicks, two recruiters on the same
+# candidate) are answered without another API call.
+# -----------------------------------------------------------------
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+# Hits and misses are counted per namespace, so stage lookups do not blur the whole-output hit rate
+OUTPUT_NAMESPACE = "output"
+
+
+def normalize_text(text):
+    """Collapses whitespace so cosmetic differences in the inputs share a cache entry."""
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+def make_cache_key(*parts):
+    """Hashes the normalized parts into a stable cache key."""
+    normalized = [normalize_text(part) if isinstance(part, str) else part for part in parts]
+    payload = json.dumps(normalized, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """SQLite-backed key/value cache with TTL expiry and size-based LRU eviction.
+
+    A single connection is shared by every session and batch worker in the
+    process, so all access goes through one lock. Hit/miss counters are kept
+    per namespace (whole outputs, each pipeline stage).
+    """
+
+    def __init__(self, path, ttl_seconds=DEFAULT_TTL_SECONDS, max_entries=DEFAULT_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generations ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " last_used_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS generations_last_used_at ON generations (last_used_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS generations_created_at ON generations (created_at)")
+
+    def _count(self, namespace, hit):
+        """Adds one hit or miss to the namespace's counters. Caller holds the lock."""
+        counters = self._counters.setdefault(namespace, {"hits": 0, "misses": 0})
+        counters["hits" if hit else "misses"] += 1
+
+    def get(self, key, count=True, namespace=OUTPUT_NAMESPACE):
+        """Returns the cached value for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created_at FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                if row is not None:
+                    self._conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+                if count:
+                    self._count(namespace, False)
+                return None
+            self._conn.execute("UPDATE generations SET last_used_at = ? WHERE key = ?", (now, key))
+            if count:
+                self._count(namespace, True)
+        return json.loads(row[0])
+
+    def get_or_set(self, key, compute, namespace=OUTPUT_NAMESPACE):
+        """Returns the cached value for key, calling compute() to fill it on a miss.
+
+        Concurrent callers missing on the same key share one in-flight Future:
+        the first caller runs compute() and every caller waiting on it gets its
+        result or its exception, so a batch of candidates sharing one job
+        description triggers a single computation, and a failure is not retried
+        once per waiter. Only that computation counts as a miss; the callers
+        served its result count as hits.
+        """
+        # Each caller is counted once: a hit here or after waiting, or the miss that computes
+        value = self.get(key, count=False)
+        with self._lock:
+            if value is not None:
+                self._count(namespace, True)
+                return value
+            future = self._in_flight.get(key)
+            owner = future is None
+            if owner:
+                future = self._in_flight[key] = Future()
+            else:
+                self._count(namespace, True)
+        if not owner:
+            return future.result()
+        try:
+            # A computation may have finished between the first lookup and registering this one
+            value = self.get(key, count=False)
+            with self._lock:
+                self._count(namespace, value is not None)
+            if value is None:
+                value = compute()
+                self.set(key, value)
+            future.set_result(value)
+            return value
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            # Removed only once resolved, so no caller can start a second computation while this one runs
+            with self._lock:
+                self._in_flight.pop(key, None)
+
+    def set(self, key, value):
+        """Stores value under key, then drops expired and least recently used entries."""
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO generations (key, value, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._conn.execute("DELETE FROM generations WHERE created_at < ?", (now - self.ttl_seconds,))
+            self._conn.execute(
+                "DELETE FROM generations WHERE key IN ("
+                " SELECT key FROM generations ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def stats(self, namespace=OUTPUT_NAMESPACE):
+        """Returns one namespace's hit/miss counters for this process and the number of stored entries."""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+            counters = dict(self._counters.get(namespace, {"hits": 0, "misses": 0}))
+        return {**counters, "entries": entries}
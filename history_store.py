@@ -0,0 +1,118 @@
+# -----------------------------------------------------------------
+# GENERATION HISTORY
+# Every finished generation, per user, with a full-text index over the
+# candidate name, key points and messages, so past outputs can be found
+# and shown again without another model call.
+# -----------------------------------------------------------------
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_PAGE_SIZE = 20
+
+SEARCH_TERM_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def owner_token(owner):
+    """A single FTS token standing for the owner, so a search only walks that user's matches."""
+    return hashlib.sha256(owner.encode("utf-8")).hexdigest()[:32]
+
+
+def search_expression(owner, query):
+    """Turns free text into an FTS5 expression for one owner: every word must match, each as a prefix; None if there are no words."""
+    terms = SEARCH_TERM_PATTERN.findall(query or "")
+    if not terms:
+        return None
+    words = " ".join(f'"{term}"*' for term in terms)
+    return f'owner : "{owner_token(owner)}" AND {{candidate_name key_points messages}} : ({words})'
+
+
+def entry_hash(output, role_title, company_name):
+    return hashlib.sha256(json.dumps([output, role_title, company_name], sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+class HistoryStore:
+    """SQLite history of generated outputs with an FTS5 index, shared by every session in the process.
+
+    Listings use keyset pagination (id < before_id) on an (owner, id) index and
+    return only the summary columns, so a page costs the same however long the
+    history grows; the full output is read only when an entry is opened.
+    """
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS history ("
+            " id INTEGER PRIMARY KEY,"
+            " owner TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " candidate_name TEXT NOT NULL,"
+            " role_title TEXT,"
+            " company_name TEXT,"
+            " entry_hash TEXT NOT NULL,"
+            " output TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS history_owner_id ON history (owner, id)")
+        self._conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS history_owner_entry ON history (owner, entry_hash)")
+        # rowid is history.id; searches walk the index newest first and join back to history for the summary columns
+        self._conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS history_fts USING fts5(owner, candidate_name, key_points, messages)")
+
+    def add(self, owner, output, role_title=None, company_name=None):
+        """Stores a generated output and returns its ID. The same output for the same role moves back to the top."""
+        digest = entry_hash(output, role_title, company_name)
+        messages = "\n".join(output["short_messages"] + [output["long_message"]])
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute("SELECT id FROM history WHERE owner = ? AND entry_hash = ?", (owner, digest)).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM history WHERE id = ?", row)
+                    self._conn.execute("DELETE FROM history_fts WHERE rowid = ?", row)
+                history_id = self._conn.execute(
+                    "INSERT INTO history (owner, created_at, candidate_name, role_title, company_name, entry_hash, output)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (owner, time.time(), output["name"], role_title, company_name, digest, json.dumps(output, ensure_ascii=False)),
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO history_fts (rowid, owner, candidate_name, key_points, messages) VALUES (?, ?, ?, ?, ?)",
+                    (history_id, owner_token(owner), output["name"], output["key_points"], messages),
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return history_id
+
+    def page(self, owner, query=None, before_id=None, limit=DEFAULT_PAGE_SIZE):
+        """Returns up to limit summaries, newest first, older than before_id and matching query if given."""
+        before_id = before_id if before_id is not None else 2 ** 63 - 1
+        expression = search_expression(owner, query)
+        with self._lock:
+            if expression:
+                # CROSS JOIN keeps the full-text index as the outer loop, so the LIMIT stops the search early
+                rows = self._conn.execute(
+                    "SELECT h.id, h.created_at, h.candidate_name, h.role_title, h.company_name"
+                    " FROM history_fts CROSS JOIN history h ON h.id = history_fts.rowid"
+                    " WHERE history_fts MATCH ? AND history_fts.rowid < ? AND h.owner = ? ORDER BY history_fts.rowid DESC LIMIT ?",
+                    (expression, before_id, owner, limit),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT id, created_at, candidate_name, role_title, company_name FROM history"
+                    " WHERE owner = ? AND id < ? ORDER BY id DESC LIMIT ?",
+                    (owner, before_id, limit),
+                ).fetchall()
+        return [{"id": id, "created_at": created_at, "name": name, "role_title": role_title, "company_name": company_name}
+                for id, created_at, name, role_title, company_name in rows]
+
+    def get(self, owner, history_id):
+        """Returns one stored output, or None if it does not exist or belongs to someone else."""
+        with self._lock:
+            row = self._conn.execute("SELECT output FROM history WHERE id = ? AND owner = ?", (history_id, owner)).fetchone()
+        return json.loads(row[0]) if row else None
@@ -0,0 +1,98 @@
+# -----------------------------------------------------------------
+# BACKGROUND JOB QUEUE
+# Runs generations on a process-wide worker pool so they survive
+# Streamlit reruns. Sessions keep only a job ID and poll for the result.
+# -----------------------------------------------------------------
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Finished jobs are kept this long for their session to collect them
+DEFAULT_RESULT_TTL_SECONDS = 15 * 60
+
+
+class Job:
+    """One unit of background work and its status, progress and outcome."""
+
+    def __init__(self, job_id, key):
+        self.id = job_id
+        self.key = key
+        self.status = QUEUED
+        self.partial = None
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED)
+
+    def update_partial(self, partial):
+        """Records in-progress output; handed to the job function as on_update."""
+        self.partial = partial
+
+
+class JobQueue:
+    """Thread-pool job queue with job IDs and deduplication of identical in-flight jobs."""
+
+    def __init__(self, max_workers, result_ttl_seconds=DEFAULT_RESULT_TTL_SECONDS, name="jobs"):
+        self.result_ttl_seconds = result_ttl_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._jobs = {}
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, with_progress=False, **kwargs):
+        """Queues fn(*args, **kwargs) and returns its job ID.
+
+        If a job with the same key is still queued or running, its ID is
+        returned instead of starting a duplicate. With with_progress=True, fn
+        is also passed on_update=job.update_partial.
+        """
+        with self._lock:
+            self._drop_expired()
+            job_id = self._in_flight.get(key)
+            if job_id is not None:
+                return job_id
+            job = Job(uuid.uuid4().hex, key)
+            self._jobs[job.id] = job
+            self._in_flight[key] = job.id
+        if with_progress:
+            kwargs["on_update"] = job.update_partial
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        """Returns the job with this ID, or None if it is unknown or has expired."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self):
+        """Counts jobs by status."""
+        with self._lock:
+            counts = {QUEUED: 0, RUNNING: 0, DONE: 0, FAILED: 0}
+            for job in self._jobs.values():
+                counts[job.status] += 1
+        return counts
+
+    def _run(self, job, fn, args, kwargs):
+        job.status = RUNNING
+        try:
+            job.result = fn(*args, **kwargs)
+            status = DONE
+        except Exception as e:
+            job.error = e
+            status = FAILED
+        with self._lock:
+            job.finished_at = time.time()
+            job.status = status
+            self._in_flight.pop(job.key, None)
+
+    def _drop_expired(self):
+        cutoff = time.time() - self.result_ttl_seconds
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
@@ -0,0 +1,183 @@
+# -----------------------------------------------------------------
+# METRICS
+# Per-generation timing spans and token counts, written to a local
+# SQLite sink and summarized (p50/p95/p99) for the admin dashboard.
+# -----------------------------------------------------------------
+import json
+import math
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+GENERATION = "generation"
+PDF_EXTRACTION = "extract_pdf"
+RANKING = "rank_candidates"
+
+
+class GenerationTrace:
+    """Collects timing spans, token usage and cache outcome for one generation.
+
+    Spans may be recorded from several threads (the staged pipeline runs the
+    JD analysis alongside the profile summary); each span name is written once.
+    """
+
+    def __init__(self, kind=GENERATION, **fields):
+        self.kind = kind
+        self.started_at = time.time()
+        self._start = time.perf_counter()
+        self.total_ms = None
+        self.spans = {}
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit = False
+        self.error = None
+        self.fields = fields
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name):
+        """Times the enclosed block and stores it as a span in milliseconds."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, (time.perf_counter() - start) * 1000)
+
+    def add_span(self, name, duration_ms):
+        with self._lock:
+            self.spans[name] = self.spans.get(name, 0.0) + duration_ms
+
+    def add_usage(self, usage):
+        """Adds the token counts from an API response's usage block."""
+        if usage is None:
+            return
+        with self._lock:
+            self.prompt_tokens += usage.prompt_tokens or 0
+            self.completion_tokens += usage.completion_tokens or 0
+
+    def add_route(self, route):
+        """Records which model served one call and how it went (see ModelRouter); stored with the fields."""
+        with self._lock:
+            self.fields.setdefault("routes", []).append(route)
+
+    def finish(self):
+        self.total_ms = (time.perf_counter() - self._start) * 1000
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of values; None for an empty list."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class MetricsStore:
+    """Append-only SQLite sink for generation traces."""
+
+    def __init__(self, path):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS generation_metrics ("
+            " id INTEGER PRIMARY KEY,"
+            " ts REAL NOT NULL,"
+            " kind TEXT NOT NULL,"
+            " total_ms REAL,"
+            " spans TEXT NOT NULL,"
+            " prompt_tokens INTEGER NOT NULL,"
+            " completion_tokens INTEGER NOT NULL,"
+            " cache_hit INTEGER NOT NULL,"
+            " error TEXT,"
+            " fields TEXT NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS generation_metrics_kind_ts ON generation_metrics (kind, ts)")
+
+    def record(self, trace):
+        """Writes a finished trace."""
+        if trace.total_ms is None:
+            trace.finish()
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO generation_metrics (ts, kind, total_ms, spans, prompt_tokens, completion_tokens, cache_hit, error, fields)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (trace.started_at, trace.kind, trace.total_ms, json.dumps(trace.spans), trace.prompt_tokens,
+                 trace.completion_tokens, int(trace.cache_hit), trace.error, json.dumps(trace.fields, default=str)),
+            )
+
+    def fetch(self, kind, since):
+        """Returns the records of one kind written since the given Unix time, oldest first."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ts, total_ms, spans, prompt_tokens, completion_tokens, cache_hit, error, fields"
+                " FROM generation_metrics WHERE kind = ? AND ts >= ? ORDER BY ts",
+                (kind, since),
+            ).fetchall()
+        return [
+            {"ts": ts, "total_ms": total_ms, "spans": json.loads(spans), "prompt_tokens": prompt_tokens,
+             "completion_tokens": completion_tokens, "cache_hit": bool(cache_hit), "error": error, **json.loads(fields)}
+            for ts, total_ms, spans, prompt_tokens, completion_tokens, cache_hit, error, fields in rows
+        ]
+
+
+def summarize(records):
+    """Latency percentiles, token averages and hit/error rates for a list of records."""
+    latencies = [r["total_ms"] for r in records if r["total_ms"] is not None and not r["error"]]
+    count = len(records)
+    return {
+        "count": count,
+        "p50_ms": percentile(latencies, 50),
+        "p95_ms": percentile(latencies, 95),
+        "p99_ms": percentile(latencies, 99),
+        "avg_prompt_tokens": sum(r["prompt_tokens"] for r in records) / count if count else None,
+        "avg_completion_tokens": sum(r["completion_tokens"] for r in records) / count if count else None,
+        "cache_hit_rate": sum(r["cache_hit"] for r in records) / count if count else None,
+        "error_rate": sum(1 for r in records if r["error"]) / count if count else None,
+    }
+
+
+def summarize_spans(records):
+    """p50/p95/p99 for every span name seen in the records."""
+    durations = {}
+    for record in records:
+        for name, duration_ms in record["spans"].items():
+            durations.setdefault(name, []).append(duration_ms)
+    return {
+        name: {"count": len(values), "p50_ms": percentile(values, 50), "p95_ms": percentile(values, 95), "p99_ms": percentile(values, 99)}
+        for name, values in sorted(durations.items())
+    }
+
+
+def summarize_routes(records):
+    """Latency percentiles, hedge/fallback rates and cost per (stage, model) route."""
+    routes = {}
+    for record in records:
+        for route in record.get("routes", []):
+            routes.setdefault((route["stage"], route["model"]), []).append(route)
+    summary = {}
+    for key, calls in sorted(routes.items()):
+        latencies = [call["latency_ms"] for call in calls]
+        costs = [call["cost_usd"] for call in calls if call["cost_usd"] is not None]
+        summary[key] = {
+            "count": len(calls),
+            "p50_ms": percentile(latencies, 50),
+            "p95_ms": percentile(latencies, 95),
+            "p99_ms": percentile(latencies, 99),
+            "p95_first_token_ms": percentile([call["first_token_ms"] for call in calls], 95),
+            "hedge_rate": sum(call["hedged"] for call in calls) / len(calls),
+            "fallback_rate": sum(call["fallback"] for call in calls) / len(calls),
+            "total_cost_usd": sum(costs) if costs else None,
+        }
+    return summary
+
+
+def bucket_over_time(records, bucket_seconds):
+    """Groups records into time buckets and summarizes each one, oldest first."""
+    buckets = {}
+    for record in records:
+        buckets.setdefault(int(record["ts"] // bucket_seconds) * bucket_seconds, []).append(record)
+    return [(start, summarize(bucket)) for start, bucket in sorted(buckets.items())]
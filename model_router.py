@@ -0,0 +1,271 @@
+# -----------------------------------------------------------------
+# MODEL ROUTING
+# Picks the model for each generation stage, hedges slow requests with a
+# second copy, falls back to the next model when one keeps failing, and
+# reports the latency and cost every route achieved.
+# -----------------------------------------------------------------
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from itertools import chain
+
+import openai
+
+from metrics import percentile
+
+# Errors that say nothing about the request itself, so another attempt or model may succeed
+TRANSIENT_ERRORS = (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError, openai.InternalServerError)
+
+# USD per million (input, output) tokens
+MODEL_PRICES = {
+    "gpt-4.1": (2.00, 8.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4o-mini": (0.15, 0.60),
+}
+
+# Hedging: a second copy of a request is sent once the first has taken longer than the
+# route's recent p95 (time to first token when streaming). Until enough samples exist the
+# defaults below are used. Each request earns HEDGE_BUDGET_PER_REQUEST hedges, so under a
+# general slowdown at most ~10% extra load is sent upstream.
+LATENCY_SAMPLES = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_SECONDS = 0.5
+DEFAULT_HEDGE_DELAY_SECONDS = {"stream": 5.0, "complete": 30.0}
+HEDGE_BUDGET_PER_REQUEST = 0.1
+HEDGE_BUDGET_MAX = 10.0
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling upstream when every model on a stage's route has an open circuit."""
+
+    def __init__(self, stage, models):
+        super().__init__("The model is temporarily unavailable. Please try again in a minute.")
+        self.stage = stage
+        self.models = models
+
+
+def estimate_cost(model, usage, prices=MODEL_PRICES):
+    """USD cost of one call from its usage block; None for a model without a known price."""
+    if usage is None or model not in prices:
+        return None
+    input_price, output_price = prices[model]
+    return ((usage.prompt_tokens or 0) * input_price + (usage.completion_tokens or 0) * output_price) / 1_000_000
+
+
+class CircuitBreaker:
+    """Stops sending traffic to a model whose recent calls mostly fail.
+
+    Closed: calls flow and outcomes are counted over a sliding window. When at
+    least min_calls recent calls have an error rate of failure_threshold or
+    more, the breaker opens and the model is skipped for cooldown_seconds.
+    After that one trial call is let through (half-open); its outcome closes
+    or re-opens the breaker.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half-open"
+
+    def __init__(self, failure_threshold=0.5, min_calls=5, window_seconds=60, cooldown_seconds=30):
+        self.failure_threshold = failure_threshold
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.cooldown_seconds = cooldown_seconds
+        self.state = self.CLOSED
+        self._outcomes = deque()
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True if a call may be sent now; in the half-open state only one trial call is allowed."""
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.cooldown_seconds:
+                self.state, self._trial_in_flight = self.HALF_OPEN, False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return self.state == self.CLOSED
+
+    def record(self, ok):
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._outcomes.clear()
+                self.state = self.CLOSED if ok else self.OPEN
+                self._opened_at = None if ok else now
+                return
+            self._outcomes.append((now, ok))
+            while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+                self._outcomes.popleft()
+            failures = sum(1 for _, succeeded in self._outcomes if not succeeded)
+            if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.failure_threshold:
+                self.state, self._opened_at = self.OPEN, now
+
+    def error_rate(self):
+        with self._lock:
+            return sum(1 for _, ok in self._outcomes if not ok) / len(self._outcomes) if self._outcomes else 0.0
+
+
+class ModelRouter:
+    """Routes chat completions per stage over an ordered list of models.
+
+    routes maps a stage name to its models, preferred first; stages without
+    an entry use routes["default"]. A model whose circuit breaker is open is
+    skipped, and a transient failure moves on to the next model in the route;
+    when every model's breaker is open the call fails with CircuitOpenError.
+    The router owns retrying: it calls the client with its own retries turned
+    off, so a failure reaches the breaker and the fallback at once.
+    """
+
+    def __init__(self, client, routes, prices=MODEL_PRICES, max_workers=32):
+        # A copy of the client that shares its connection pool but never retries on its own
+        self.client = client.with_options(max_retries=0)
+        self.routes = routes
+        self.prices = prices
+        self._breakers = {}
+        self._latencies = {}
+        self._hedge_budget = HEDGE_BUDGET_MAX / 2
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="model-router")
+
+    def models(self, stage):
+        return list(self.routes.get(stage) or self.routes["default"])
+
+    def breaker(self, model):
+        with self._lock:
+            return self._breakers.setdefault(model, CircuitBreaker())
+
+    def complete(self, stage, messages, trace=None, **kwargs):
+        """Runs a non-streamed completion over the stage's route and returns the response."""
+        def attempt(model):
+            return self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+
+        response, model, hedged, fallback, latency_ms = self._route(stage, "complete", attempt)
+        self._record_route(trace, stage, model, latency_ms, latency_ms, hedged, fallback, response.usage)
+        return response
+
+    def stream(self, stage, messages, trace=None, **kwargs):
+        """Streams a completion over the stage's route, yielding its chunks.
+
+        Hedging and fallback apply up to the first content chunk; once a stream
+        has started producing text it is the one the caller receives.
+        """
+        def attempt(model):
+            stream = self.client.chat.completions.create(model=model, messages=messages, stream=True,
+                                                         stream_options={"include_usage": True}, **kwargs)
+            buffered = []
+            for chunk in stream:
+                buffered.append(chunk)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    break
+            return stream, buffered
+
+        start = time.perf_counter()
+        (stream, buffered), model, hedged, fallback, first_token_ms = self._route(stage, "stream", attempt)
+        usage = None
+        try:
+            for chunk in chain(buffered, stream):
+                if getattr(chunk, "usage", None):
+                    usage = chunk.usage
+                yield chunk
+        finally:
+            stream.close()
+        self._record_route(trace, stage, model, (time.perf_counter() - start) * 1000, first_token_ms, hedged, fallback, usage)
+
+    def status(self):
+        """Breaker state and recent error rate for every model used so far."""
+        with self._lock:
+            breakers = dict(self._breakers)
+        rows = []
+        for model, breaker in sorted(breakers.items()):
+            rows.append({"model": model, "circuit": breaker.state, "recent error rate": round(breaker.error_rate(), 3)})
+        return rows
+
+    def _route(self, stage, mode, attempt):
+        """Tries the stage's models in order; returns (result, model, hedged, fallback, latency_ms)."""
+        models = self.models(stage)
+        last_error = None
+        for position, model in enumerate(models):
+            # allow() is only asked of the model about to be tried, since it hands out the half-open trial call
+            if not self.breaker(model).allow():
+                continue
+            try:
+                result, hedged, latency_ms = self._hedged(stage, mode, model, attempt)
+                return result, model, hedged, position > 0, latency_ms
+            except TRANSIENT_ERRORS as e:
+                last_error = e
+        if last_error is not None:
+            raise last_error
+        # Every breaker is open: fail fast, so a struggling upstream gets no more traffic until a cooldown ends
+        raise CircuitOpenError(stage, models)
+
+    def _hedged(self, stage, mode, model, attempt):
+        """Runs attempt(model), sending a second copy if the first is slower than the route's p95."""
+        key = (stage, mode, model)
+        breaker = self.breaker(model)
+
+        def timed_attempt():
+            attempt_start = time.perf_counter()
+            try:
+                result = attempt(model)
+            except TRANSIENT_ERRORS:
+                breaker.record(False)
+                raise
+            except Exception:
+                # A rejected request still shows the model is up
+                breaker.record(True)
+                raise
+            breaker.record(True)
+            self._add_latency(key, time.perf_counter() - attempt_start)
+            return result
+
+        start = time.perf_counter()
+        with self._lock:
+            self._hedge_budget = min(HEDGE_BUDGET_MAX, self._hedge_budget + HEDGE_BUDGET_PER_REQUEST)
+        pending = {self._executor.submit(timed_attempt)}
+        done, _ = wait(pending, timeout=self._hedge_delay(key, mode))
+        hedged = False
+        if not done and self._take_hedge():
+            pending.add(self._executor.submit(timed_attempt))
+            hedged = True
+
+        last_error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # The slower copy is abandoned; an open stream is closed as soon as it arrives
+                    if mode == "stream":
+                        for loser in pending:
+                            loser.add_done_callback(lambda f: f.exception() is None and f.result()[0].close())
+                    return future.result(), hedged, (time.perf_counter() - start) * 1000
+                last_error = future.exception()
+        raise last_error
+
+    def _hedge_delay(self, key, mode):
+        with self._lock:
+            samples = list(self._latencies.get(key, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return DEFAULT_HEDGE_DELAY_SECONDS[mode]
+        return max(HEDGE_MIN_DELAY_SECONDS, percentile(samples, 95))
+
+    def _take_hedge(self):
+        with self._lock:
+            if self._hedge_budget < 1:
+                return False
+            self._hedge_budget -= 1
+            return True
+
+    def _add_latency(self, key, seconds):
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_SAMPLES)).append(seconds)
+
+    def _record_route(self, trace, stage, model, latency_ms, first_token_ms, hedged, fallback, usage):
+        if trace is None:
+            return
+        trace.add_route({
+            "stage": stage, "model": model, "latency_ms": latency_ms, "first_token_ms": first_token_ms,
+            "hedged": hedged, "fallback": fallback, "cost_usd": estimate_cost(model, usage, self.prices),
+        })
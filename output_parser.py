@@ -0,0 +1,169 @@
+# -----------------------------------------------------------------
+# OUTPUT PARSING
+# Turns the tagged model output ([CANDIDATE_NAME], [KEY_POINTS],
+# [OUTREACH_MESSAGES], [EMAIL_MESSAGE]) or the structured JSON reply
+# into the dict the UI renders.
+# -----------------------------------------------------------------
+import json
+import re
+
+# Every section marker, opening or closing, in one precompiled pattern so the output is scanned once
+MARKER_PATTERN = re.compile(r"\[(END_)?(CANDIDATE_NAME|KEY_POINTS|OUTREACH_MESSAGES|EMAIL_MESSAGE)\]")
+
+# A list number at the start of a line ("1. ", "2) "); "3.5 years" and similar are left alone
+MESSAGE_NUMBER_PATTERN = re.compile(r"^[ \t]*\d{1,2}[.)][ \t]+", re.MULTILINE)
+
+DEFAULT_CANDIDATE_NAME = "Candidate"
+
+
+def split_messages(messages_raw):
+    """Splits the numbered outreach messages block into a list of messages."""
+    return [msg.strip() for msg in MESSAGE_NUMBER_PATTERN.split(messages_raw) if msg.strip()]
+
+
+def split_tagged_sections(output_text):
+    """Returns {tag: body} for each section in one pass over the markers.
+
+    A section ends at its closing marker or at the next opening marker, so a
+    missing closing tag (the outreach block rarely has one) does not lose the
+    section. The first occurrence of a section wins.
+    """
+    sections = {}
+    open_tag, body_start = None, 0
+    for match in MARKER_PATTERN.finditer(output_text):
+        is_end, tag = match.group(1), match.group(2)
+        if open_tag is not None and (not is_end or tag == open_tag):
+            sections[open_tag] = output_text[body_start:match.start()]
+            open_tag = None
+        if not is_end and tag not in sections:
+            open_tag, body_start = tag, match.end()
+    if open_tag is not None:
+        sections[open_tag] = output_text[body_start:]
+    return sections
+
+
+def output_from_sections(sections):
+    """Builds the output dict the UI renders from {tag: body}."""
+    return {
+        "name": sections.get("CANDIDATE_NAME", "").strip() or DEFAULT_CANDIDATE_NAME,
+        "key_points": sections.get("KEY_POINTS", "").strip(),
+        "short_messages": split_messages(sections.get("OUTREACH_MESSAGES", "")),
+        "long_message": sections.get("EMAIL_MESSAGE", "").strip(),
+    }
+
+
+def parse_ai_output(output_text):
+    """Parses the structured output from the AI model."""
+    return output_from_sections(split_tagged_sections(output_text))
+
+
+# --- Structured (JSON) output ---
+# With OUTPUT_FORMAT = "json" the model is asked for this schema instead of tagged text,
+# and the reply is validated rather than pattern-matched.
+SHORT_MESSAGE_COUNT = 3
+
+OUTPUT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "candidate_name": {"type": "string"},
+        "key_points": {"type": "string"},
+        "short_messages": {"type": "array", "items": {"type": "string"}},
+        "email_message": {"type": "string"},
+    },
+    "required": ["candidate_name", "key_points", "short_messages", "email_message"],
+    "additionalProperties": False,
+}
+
+STRUCTURED_RESPONSE_FORMAT = {"type": "json_schema", "json_schema": {"name": "outreach_output", "strict": True, "schema": OUTPUT_SCHEMA}}
+
+
+class OutputValidationError(ValueError):
+    """Raised when a structured model reply does not match OUTPUT_SCHEMA."""
+
+
+def _required_text(data, field):
+    value = data.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise OutputValidationError(f"The model's reply is missing '{field}'.")
+    return value.strip()
+
+
+def parse_structured_output(output_text):
+    """Validates a JSON reply against OUTPUT_SCHEMA and returns it in the same shape as parse_ai_output."""
+    try:
+        data = json.loads(output_text)
+    except (TypeError, ValueError) as e:
+        raise OutputValidationError(f"The model's reply is not valid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise OutputValidationError("The model's reply is not a JSON object.")
+    unexpected = set(data) - set(OUTPUT_SCHEMA["properties"])
+    if unexpected:
+        raise OutputValidationError(f"The model's reply has unexpected fields: {', '.join(sorted(unexpected))}.")
+
+    messages = data.get("short_messages")
+    if not isinstance(messages, list) or not all(isinstance(msg, str) and msg.strip() for msg in messages):
+        raise OutputValidationError("The model's reply has no usable 'short_messages'.")
+    if len(messages) != SHORT_MESSAGE_COUNT:
+        raise OutputValidationError(f"Expected {SHORT_MESSAGE_COUNT} short messages, got {len(messages)}.")
+
+    return {
+        "name": _required_text(data, "candidate_name"),
+        "key_points": _required_text(data, "key_points"),
+        "short_messages": [msg.strip() for msg in messages],
+        "long_message": _required_text(data, "email_message"),
+    }
+
+
+# A marker can be split across chunks; at most this much of the stream's tail is held back until it completes
+LONGEST_MARKER = max(len(f"[END_{tag}]") for tag in ("CANDIDATE_NAME", "KEY_POINTS", "OUTREACH_MESSAGES", "EMAIL_MESSAGE"))
+
+
+class StreamingOutputParser:
+    """Incrementally parses model output as streamed chunks arrive.
+
+    It applies split_tagged_sections' rules as the markers arrive, remembering
+    closed sections and the open one between chunks, so each feed only scans
+    the newly arrived text. Only a trailing partial marker such as "[END_KEY"
+    is held back. snapshot() returns whatever is known so far; once the stream
+    is complete it equals result(), which is exactly parse_ai_output's answer.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._scanned = 0
+        self._sections = {}
+        self._open_tag = None
+        self._body_start = 0
+
+    @property
+    def text(self):
+        return self._text
+
+    def feed(self, chunk):
+        """Appends a chunk of streamed text and returns the updated snapshot."""
+        self._text += chunk
+        # Text from the last "[" that has no "]" yet may still become a marker, so it is not scanned yet
+        scan_end = len(self._text)
+        bracket = self._text.rfind("[", max(self._scanned, scan_end - LONGEST_MARKER + 1))
+        if bracket != -1 and "]" not in self._text[bracket:]:
+            scan_end = bracket
+        for match in MARKER_PATTERN.finditer(self._text, self._scanned, scan_end):
+            is_end, tag = match.group(1), match.group(2)
+            if self._open_tag is not None and (not is_end or tag == self._open_tag):
+                self._sections[self._open_tag] = self._text[self._body_start:match.start()]
+                self._open_tag = None
+            if not is_end and tag not in self._sections:
+                self._open_tag, self._body_start = tag, match.end()
+        self._scanned = scan_end
+        return self.snapshot()
+
+    def snapshot(self):
+        """Returns the partially parsed output in the same shape as parse_ai_output."""
+        sections = dict(self._sections)
+        if self._open_tag is not None:
+            sections[self._open_tag] = self._text[self._body_start:self._scanned]
+        return output_from_sections(sections)
+
+    def result(self):
+        """Returns the final parsed output for the complete streamed text."""
+        return parse_ai_output(self._text)
@@ -0,0 +1,147 @@
+# -----------------------------------------------------------------
+# PDF EXTRACTION ENGINE
+# Page-by-page text extraction with a page/character budget, repeated
+# header/footer removal and a process pool for long documents.
+# -----------------------------------------------------------------
+import multiprocessing
+import os
+import re
+import threading
+from collections import Counter, deque
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+# Documents shorter than this are parsed in-process. Each pool task pickles the PDF and reopens it,
+# which measured slower than serial extraction at 20-30 pages (20.3 vs 16.8 ms on the 30-page
+# benchmark resume capped at 20 pages), and a single worker is never faster than serial. With the
+# app's default PDF_MAX_PAGES of 20 the pool is therefore unused; it only helps when the page cap
+# is raised for long documents on a multi-core host.
+PARALLEL_MIN_PAGES = 64
+PAGES_PER_TASK = 8
+MAX_POOL_WORKERS = min(4, os.cpu_count() or 1)
+MAX_TASKS_IN_FLIGHT = MAX_POOL_WORKERS + 1
+
+# Header/footer detection looks at the first and last lines of the opening pages
+EDGE_SAMPLE_PAGES = 6
+EDGE_LINES = 2
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_process_pool():
+    """Returns the process-wide extraction pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn, not fork: the Streamlit server is multi-threaded and forking it is unsafe
+            _pool = ProcessPoolExecutor(max_workers=MAX_POOL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _extract_page_range(pdf_bytes, start, stop):
+    """Extracts raw text for pages [start, stop). Runs inside pool workers."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        return [pdf_document[i].get_text() for i in range(start, stop)]
+
+
+def _iter_raw_pages(pdf_bytes, page_limit):
+    """Yields raw page texts in order, fanning large documents out over the process pool."""
+    if page_limit < PARALLEL_MIN_PAGES or MAX_POOL_WORKERS < 2:
+        # One page at a time, so a consumer that stops early never parses the rest
+        with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+            for i in range(page_limit):
+                yield pdf_document[i].get_text()
+        return
+
+    # Only a bounded window of page ranges is in flight, topped up as pages are consumed,
+    # so a consumer that stops early (its character budget spent) leaves little work behind
+    pool = get_process_pool()
+    starts = iter(range(0, page_limit, PAGES_PER_TASK))
+    in_flight = deque()
+
+    def submit_next():
+        start = next(starts, None)
+        if start is not None:
+            in_flight.append(pool.submit(_extract_page_range, pdf_bytes, start, min(start + PAGES_PER_TASK, page_limit)))
+
+    for _ in range(MAX_TASKS_IN_FLIGHT):
+        submit_next()
+    try:
+        while in_flight:
+            pages = in_flight.popleft().result()
+            submit_next()
+            yield from pages
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+PAGE_NUMBER_PATTERN = re.compile(r"^(page\s*)?\d+(\s*(of|/)\s*\d+)?$")
+
+
+def _edge_key(line):
+    """Normalizes a line for header/footer matching so "Page 1 of 3" matches "Page 2 of 3"."""
+    key = re.sub(r"\s+", " ", line.strip().lower())
+    return "<page number>" if PAGE_NUMBER_PATTERN.match(key) else key
+
+
+def _edge_lines(page_text):
+    lines = [line for line in page_text.splitlines() if line.strip()]
+    return lines[:EDGE_LINES] + lines[-EDGE_LINES:]
+
+
+def find_repeated_edges(page_texts):
+    """Returns normalized lines that recur at the top or bottom of most sampled pages."""
+    if len(page_texts) < 2:
+        return set()
+    counts = Counter(key for page_text in page_texts for key in {_edge_key(line) for line in _edge_lines(page_text)})
+    threshold = max(2, (len(page_texts) + 1) // 2)
+    return {key for key, count in counts.items() if key and count >= threshold}
+
+
+def clean_page_text(page_text, repeated_edges=frozenset()):
+    """Drops repeated header/footer lines and collapses whitespace runs."""
+    lines = page_text.splitlines()
+    non_blank = [i for i, line in enumerate(lines) if line.strip()]
+    # Pages too short to have a distinct header and footer are left alone
+    if repeated_edges and len(non_blank) > 2 * EDGE_LINES:
+        edge_indexes = set(non_blank[:EDGE_LINES] + non_blank[-EDGE_LINES:])
+        lines = [line for i, line in enumerate(lines) if not (i in edge_indexes and _edge_key(line) in repeated_edges)]
+    text = "\n".join(re.sub(r"[ \t\u00a0]+", " ", line).strip() for line in lines)
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+
+def iter_pdf_pages(pdf_bytes, max_pages=None, max_chars=None):
+    """Yields cleaned page texts one at a time, stopping once the page or character budget is spent."""
+    with fitz.open(stream=pdf_bytes, filetype="pdf") as pdf_document:
+        page_count = pdf_document.page_count
+    page_limit = min(page_count, max_pages) if max_pages else page_count
+
+    raw_pages = _iter_raw_pages(pdf_bytes, page_limit)
+    try:
+        # Learn the header/footer lines from the opening pages, then clean every page with them
+        sample = [page for _, page in zip(range(EDGE_SAMPLE_PAGES), raw_pages)]
+        repeated_edges = find_repeated_edges(sample)
+
+        remaining = max_chars
+        for page_number, raw_page in enumerate(chain(sample, raw_pages)):
+            # The first page keeps its header: on résumés that is usually the candidate's name
+            page_text = clean_page_text(raw_page, repeated_edges if page_number else frozenset())
+            if not page_text:
+                continue
+            if remaining is not None:
+                page_text = page_text[:remaining]
+                remaining -= len(page_text)
+            yield page_text
+            if remaining is not None and remaining <= 0:
+                return
+    finally:
+        raw_pages.close()
+
+
+def extract_pdf_text(pdf_bytes, max_pages=None, max_chars=None):
+    """Extracts the budgeted, cleaned text of a PDF as a single string."""
+    return "\n\n".join(iter_pdf_pages(pdf_bytes, max_pages=max_pages, max_chars=max_chars))
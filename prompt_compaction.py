@@ -0,0 +1,190 @@
+# -----------------------------------------------------------------
+# PROMPT COMPACTION
+# Shrinks the candidate profile and job description to a token budget
+# before they are embedded in the prompt: legal boilerplate and (over
+# budget) repeated paragraphs go first, then low-value sections, keeping
+# what SYSTEM_PROMPT actually uses (education, experience, achievements,
+# skills, the role).
+# -----------------------------------------------------------------
+import re
+
+# gpt-4.1 models use the o200k_base encoding
+TOKENIZER_ENCODING = "o200k_base"
+CHARS_PER_TOKEN = 4
+
+_encoding = None
+_encoding_loaded = False
+
+
+def _get_encoding():
+    """Loads the tiktoken encoding once; returns None if tiktoken or its data is unavailable."""
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        _encoding_loaded = True
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+        except Exception:
+            # tiktoken downloads its vocabulary on first use; offline hosts fall back to an estimate
+            _encoding = None
+    return _encoding
+
+
+def count_tokens(text):
+    """Counts tokens locally, estimating from length when no tokenizer is available."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // CHARS_PER_TOKEN)
+
+
+# Lower number = kept first. Priority DROP sections never reach the prompt.
+# Headings must match a whole line so job titles like "Legal Counsel" or "Benefits Analyst" are not mistaken for sections.
+KEEP, USEFUL, OPTIONAL, DROP = 0, 1, 2, 3
+SECTION_PRIORITIES = [
+    (DROP, r"equal (employment )?opportunity( employer| statement)?|eeo( statement)?|diversity statement|(reasonable )?accommodations?"
+           r"|privacy( notice| policy)?|legal( notice| disclaimer)?|disclaimer|e-verify|how to apply|application process"),
+    (OPTIONAL, r"(benefits|perks)(( and| &) (perks|benefits))?|compensation(( and| &) benefits)?|salary( range)?|pay range"
+               r"|interests|hobbies|references|publications|volunteer( experience| work)?"),
+    (KEEP, r"([\w&/'-]+ ){0,2}(experience|employment|work history|achievements|accomplishments|awards|honors([ -]awards)?"
+           r"|education|skills|summary|profile|responsibilities|requirements|qualifications)"
+           r"|about me|what you('| wi)ll do|what you bring|what we're looking for|about the (role|job|position)|role overview"),
+    (USEFUL, r"about (us|the company|the team)|(our )?(mission|culture|values)|projects|certifications|licenses( (and|&) certifications)?"
+             r"|languages|why join( us)?"),
+]
+SECTION_PATTERNS = [(priority, re.compile(pattern, re.IGNORECASE)) for priority, pattern in SECTION_PRIORITIES]
+
+# Paragraphs carrying these phrases are legal boilerplate wherever they appear
+BOILERPLATE_PATTERN = re.compile(
+    r"equal opportunity employer|without regard to (race|age|sex)|reasonable accommodation|protected veteran"
+    r"|e-verify|pay transparency|privacy (notice|policy)|applicants with disabilities",
+    re.IGNORECASE,
+)
+
+MAX_HEADING_WORDS = 6
+
+# Over budget, a line this long that appeared earlier is a pasted duplicate; shorter lines
+# (job titles, locations, dates) legitimately repeat across roles and are always kept
+MIN_DEDUPE_WORDS = 8
+
+# A cut-off line shorter than this is just noise, so the budget's leftover is dropped instead
+MIN_TRUNCATED_LINE_TOKENS = 16
+
+
+def section_priority(line):
+    """Returns the priority of a heading line, or None if the line is not a recognised heading."""
+    heading = line.strip().strip("#*•-:_ ").strip()
+    if not heading or len(heading.split()) > MAX_HEADING_WORDS or heading.endswith("."):
+        return None
+    for priority, pattern in SECTION_PATTERNS:
+        if pattern.fullmatch(heading):
+            return priority
+    return None
+
+
+def split_sections(text):
+    """Splits text into (priority, lines) blocks at recognised headings; the opening block is always kept."""
+    sections = [(KEEP, [])]
+    for line in text.splitlines():
+        priority = section_priority(line)
+        if priority is not None:
+            sections.append((priority, [line]))
+        else:
+            sections[-1][1].append(line)
+    return [(priority, lines) for priority, lines in sections if any(line.strip() for line in lines)]
+
+
+def _drop_boilerplate_paragraphs(lines):
+    """Removes blank-line-separated paragraphs that contain legal boilerplate."""
+    kept, paragraph = [], []
+    for line in lines + [""]:
+        if line.strip():
+            paragraph.append(line)
+            continue
+        if paragraph and not BOILERPLATE_PATTERN.search(" ".join(paragraph)):
+            kept.extend(paragraph)
+            kept.append("")
+        paragraph = []
+    return kept
+
+
+def truncate_to_tokens(text, token_budget):
+    """Cuts text down to at most token_budget tokens, ending on a word boundary."""
+    encoding = _get_encoding()
+    if encoding is not None:
+        truncated = encoding.decode(encoding.encode(text, disallowed_special=())[:token_budget])
+    else:
+        truncated = text[:token_budget * CHARS_PER_TOKEN]
+    if len(truncated) < len(text) and " " in truncated:
+        truncated = truncated.rsplit(" ", 1)[0]
+    return truncated
+
+
+def compact_text(text, token_budget):
+    """Returns text trimmed to token_budget, dropping boilerplate and, over budget, duplicates, keeping high-value sections."""
+    if not text:
+        return text
+
+    # Text that already fits loses only DROP sections and boilerplate, never content lines
+    dedupe = count_tokens(text) > token_budget
+    seen = set()
+    previous_key = None
+    blocks = []
+    for index, (priority, lines) in enumerate(split_sections(text)):
+        if priority == DROP:
+            continue
+        block = []
+        for line in _drop_boilerplate_paragraphs(lines):
+            key = re.sub(r"\s+", " ", line).strip().lower()
+            # Keep one blank line between paragraphs
+            if not key:
+                if block and block[-1].strip():
+                    block.append(line)
+                continue
+            # Drop consecutive repeats and repeated paragraph-length lines
+            if dedupe and (key == previous_key or (key in seen and len(key.split()) >= MIN_DEDUPE_WORDS)):
+                continue
+            seen.add(key)
+            previous_key = key
+            block.append(line)
+        if block:
+            blocks.append((priority, index, block))
+
+    # Fill the budget in priority order (document order within a priority), then restore document order
+    remaining = token_budget
+    kept = []
+    for priority, index, block in sorted(blocks, key=lambda b: (b[0], b[1])):
+        if remaining <= 0:
+            break
+        kept_lines = []
+        for line in block:
+            line_tokens = count_tokens(line + "\n")
+            if line_tokens > remaining:
+                # Long pasted paragraphs arrive as single lines; keep as much of the line as still fits
+                if remaining >= MIN_TRUNCATED_LINE_TOKENS:
+                    kept_lines.append(truncate_to_tokens(line, remaining - 1))
+                remaining = 0
+                break
+            kept_lines.append(line)
+            remaining -= line_tokens
+        if kept_lines:
+            kept.append((index, kept_lines))
+    kept.sort()
+    return "\n\n".join("\n".join(lines).strip() for _, lines in kept)
+
+
+def compact_prompt_inputs(candidate_profile, job_description, profile_budget, job_description_budget):
+    """Compacts both prompt inputs and reports their token counts before and after."""
+    compacted_profile = compact_text(candidate_profile, profile_budget)
+    compacted_job_description = compact_text(job_description, job_description_budget)
+    report = {
+        "profile_tokens_before": count_tokens(candidate_profile),
+        "profile_tokens_after": count_tokens(compacted_profile),
+        "job_description_tokens_before": count_tokens(job_description),
+        "job_description_tokens_after": count_tokens(compacted_job_description),
+    }
+    report["tokens_before"] = report["profile_tokens_before"] + report["job_description_tokens_before"]
+    report["tokens_after"] = report["profile_tokens_after"] + report["job_description_tokens_after"]
+    return compacted_profile, compacted_job_description, report
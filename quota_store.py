@@ -0,0 +1,103 @@
+# -----------------------------------------------------------------
+# GENERATION QUOTAS
+# Server-side, sliding-window generation counts per user or visitor,
+# kept in SQLite with an in-memory copy so checks never touch disk.
+# -----------------------------------------------------------------
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, deque
+
+# Subjects whose recent events are held in memory; the least recently checked are dropped first
+MAX_CACHED_SUBJECTS = 10000
+
+
+def fingerprint(*parts):
+    """Hashes identifying details (IP, user agent) so the raw values are never stored."""
+    return hashlib.sha256("\x1f".join(part or "" for part in parts).encode("utf-8")).hexdigest()[:32]
+
+
+class QuotaStore:
+    """Counts generations per subject over a sliding window.
+
+    Every event is written to SQLite, so counts survive restarts and cannot be
+    reset by clearing cookies. Each subject's events inside its window are also
+    kept in memory, so usage() is a dictionary lookup plus trimming of expired
+    events, and try_consume() adds a single INSERT. One lock makes check-and-
+    increment atomic across every session in the process.
+
+    The in-memory events and the lock are per process, so the limit holds
+    within one server process only: several processes sharing quota.db each
+    count from their own copy and could together allow more than the limit.
+    """
+
+    def __init__(self, path, max_cached_subjects=MAX_CACHED_SUBJECTS):
+        self.max_cached_subjects = max_cached_subjects
+        self._lock = threading.Lock()
+        self._events = OrderedDict()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS quota_events ("
+            " id INTEGER PRIMARY KEY,"
+            " subject TEXT NOT NULL,"
+            " ts REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS quota_events_subject_ts ON quota_events (subject, ts)")
+
+    def _recent_events(self, subject, window_seconds, now):
+        """Returns the subject's in-window (ts, id) deque, loading it from disk on first use. Caller holds the lock."""
+        cached = self._events.get(subject)
+        if cached is None or cached[0] != window_seconds:
+            rows = self._conn.execute(
+                "SELECT ts, id FROM quota_events WHERE subject = ? AND ts >= ? ORDER BY ts", (subject, now - window_seconds)
+            ).fetchall()
+            cached = (window_seconds, deque(rows))
+            self._events[subject] = cached
+            if len(self._events) > self.max_cached_subjects:
+                self._events.popitem(last=False)
+        else:
+            self._events.move_to_end(subject)
+        events = cached[1]
+        while events and events[0][0] < now - window_seconds:
+            events.popleft()
+        return events
+
+    def usage(self, subject, window_seconds):
+        """Number of generations the subject has used in the last window_seconds."""
+        with self._lock:
+            return len(self._recent_events(subject, window_seconds, time.time()))
+
+    def try_consume(self, subject, limit, window_seconds):
+        """Records one generation if the subject is under limit; returns its event ID, or None if the quota is used up.
+
+        A limit of None means unlimited: nothing is recorded and 0 is returned.
+        """
+        if limit is None:
+            return 0
+        now = time.time()
+        with self._lock:
+            events = self._recent_events(subject, window_seconds, now)
+            if len(events) >= limit:
+                return None
+            event_id = self._conn.execute("INSERT INTO quota_events (subject, ts) VALUES (?, ?)", (subject, now)).lastrowid
+            events.append((now, event_id))
+            # Events that have left the window are never read again
+            self._conn.execute("DELETE FROM quota_events WHERE subject = ? AND ts < ?", (subject, now - window_seconds))
+        return event_id
+
+    def release(self, subject, event_id):
+        """Gives back a generation that failed, so errors do not use up the quota."""
+        if not event_id:
+            return
+        with self._lock:
+            self._conn.execute("DELETE FROM quota_events WHERE id = ?", (event_id,))
+            cached = self._events.get(subject)
+            if cached is not None:
+                events = cached[1]
+                for index, (_, cached_id) in enumerate(events):
+                    if cached_id == event_id:
+                        del events[index]
+                        break